@@ -67,6 +67,9 @@ MIDDLEWARE = [
 
     #third-party
     'allauth.account.middleware.AccountMiddleware',
+
+    # finance apps
+    'transactions.middleware.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -100,6 +103,27 @@ DATABASES = {
     }
 }
 
+# Optional read replica for analytics and large list endpoints.
+# Set DB_REPLICA_HOST (and optionally DB_REPLICA_PORT) to enable it; locally it
+# can point at a second Postgres instance or even the primary itself.
+DB_REPLICA_HOST = env('DB_REPLICA_HOST', default=None)
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': env('DB_REPLICA_PORT', default=env('DB_PORT')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Optional Postgres range partitioning of Spending by date: 'month', 'year' or
+# unset. Applied by migration 0009, or later via create_spending_partitions --convert.
+SPENDING_PARTITION_INTERVAL = env('SPENDING_PARTITION_INTERVAL', default=None)
+
+DATABASE_ROUTERS = ['transactions.db_router.PrimaryReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write something
+READ_YOUR_WRITES_SECONDS = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -146,13 +170,28 @@ AUTH_USER_MODEL = "transactions.User"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'transactions.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
+# Set CACHE_URL (e.g. redis://redis:6379/0) when running more than one worker.
+# The default cache lives in each process' memory, so token revocations and
+# read-your-writes pins would only be seen by the worker that made them.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Token -> user lookups are cached so most requests skip the auth query.
+# Invalidation happens on logout, token deletion and any user save.
+TOKEN_AUTH_CACHE = {
+    'TIMEOUT': 300,  # seconds in Django's cache, when CACHE_URL is set
+    'LOCAL_TIMEOUT': 10,  # seconds in each process' memory
+    'LOG_EVERY': 1000,  # log the hit rate every N lookups
+}
+
 REST_AUTH = {
     'REGISTER_SERIALIZER': 'transactions.serializers.CustomRegisterSerializer',
 }
@@ -167,5 +206,22 @@ ACCOUNT_EMAIL_VERIFICATION = 'none'
 # REST-auth settings
 REST_USE_JWT = False
 
+# gpt4all is imported lazily on the first natural-language query. Set
+# LLM_WARMUP=true in processes that serve queries to load the model at startup.
+LLM_WARMUP = env.bool('LLM_WARMUP', default=False)
+
+# Semantic matching of spending names in natural-language queries ("coffee"
+# finds "Starbucks"). Needs gpt4all's embedding model file in backend/models.
+# Saved spendings are embedded on a background thread after commit; the first
+# one in each process also loads the model (~50 MB) there, not in the request.
+SPENDING_EMBEDDINGS = env.bool('SPENDING_EMBEDDINGS', default=False)
+SPENDING_INDEX_DIR = BASE_DIR / 'spending_index'
+
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Chunked receipt uploads: partial files live under MEDIA_ROOT until finalized
+RECEIPT_UPLOAD_DIR = MEDIA_ROOT / 'receipt_uploads'
+RECEIPT_UPLOAD_MAX_SIZE = 25 * 1024 * 1024
+RECEIPT_UPLOAD_MAX_CHUNK_SIZE = 5 * 1024 * 1024
+RECEIPT_UPLOAD_EXPIRY_HOURS = 24  # since the last chunk
\ No newline at end of file
@@ -1,6 +1,22 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transactions'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .db_router import install_query_counter
+
+        connection_created.connect(install_query_counter)
+
+        # Only processes that serve natural-language queries should set LLM_WARMUP
+        if settings.LLM_WARMUP:
+            from .utils.gpt_utils import warm_up_gpt_handler
+
+            threading.Thread(target=warm_up_gpt_handler, daemon=True).start()
@@ -0,0 +1,131 @@
+import copy
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .utils.cache_utils import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through settings.TOKEN_AUTH_CACHE
+DEFAULT_TIMEOUT = 300       # seconds a token stays in Django's cache
+DEFAULT_LOCAL_TIMEOUT = 10  # seconds a token stays in this process' memory
+DEFAULT_LOG_EVERY = 1000    # log the hit rate every N lookups (0 disables)
+MAX_LOCAL_ENTRIES = 10000
+
+CACHE_KEY_PREFIX = "authtoken:"
+
+_local_cache = {}  # cache key -> (expires_at, token)
+_lock = threading.Lock()
+_stats = {"local_hits": 0, "cache_hits": 0, "misses": 0}
+
+
+def _config(name, default):
+    return getattr(settings, "TOKEN_AUTH_CACHE", {}).get(name, default)
+
+
+def _cache_key(key):
+    """Hash the token so raw credentials never end up as cache keys."""
+    return CACHE_KEY_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _record(outcome):
+    with _lock:
+        _stats[outcome] += 1
+        total = sum(_stats.values())
+    log_every = _config("LOG_EVERY", DEFAULT_LOG_EVERY)
+    if log_every and total % log_every == 0:
+        logger.info("Token auth cache: %s", get_stats())
+
+
+def _prune_local_cache(now):
+    """Called with _lock held. Drops expired entries, or everything if none expired."""
+    expired = [k for k, (expires_at, _) in _local_cache.items() if expires_at <= now]
+    for k in expired:
+        del _local_cache[k]
+    if not expired:
+        _local_cache.clear()
+
+
+def get_stats():
+    """
+    Returns this process' lookup counters and the overall hit rate.
+    """
+    with _lock:
+        stats = dict(_stats)
+    total = sum(stats.values())
+    stats["lookups"] = total
+    stats["hit_rate"] = (stats["local_hits"] + stats["cache_hits"]) / total if total else 0.0
+    return stats
+
+
+def reset_stats():
+    with _lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def invalidate_token(key):
+    """
+    Drops a token from both cache layers. Other processes keep their in-memory
+    copy for at most LOCAL_TIMEOUT seconds.
+    """
+    cache_key = _cache_key(key)
+    with _lock:
+        _local_cache.pop(cache_key, None)
+    if cache_is_shared():
+        cache.delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication that caches token -> user
+    resolution, first in process memory and then in Django's cache, so most
+    requests authenticate without touching the database. The Django cache
+    layer is skipped unless CACHES is shared between processes; a per-process
+    cache would keep revoked tokens alive in the workers that did not revoke them.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        now = time.monotonic()
+
+        with _lock:
+            entry = _local_cache.get(cache_key)
+        if entry and entry[0] > now:
+            token = entry[1]
+            _record("local_hits")
+        else:
+            shared = cache_is_shared()
+            token = cache.get(cache_key) if shared else None
+            if token is not None:
+                _record("cache_hits")
+            else:
+                model = self.get_model()
+                try:
+                    token = model.objects.select_related('user').get(key=key)
+                except model.DoesNotExist:
+                    raise exceptions.AuthenticationFailed(_('Invalid token.'))
+                if shared:
+                    cache.set(cache_key, token, _config("TIMEOUT", DEFAULT_TIMEOUT))
+                _record("misses")
+            with _lock:
+                if len(_local_cache) >= MAX_LOCAL_ENTRIES:
+                    _prune_local_cache(now)
+                _local_cache[cache_key] = (now + _config("LOCAL_TIMEOUT", DEFAULT_LOCAL_TIMEOUT), token)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        # Each request gets its own copies: views may change request.user, and the
+        # cached objects are shared by every thread in the process
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return (token.user, token)
@@ -0,0 +1,17 @@
+from django.core import checks
+
+from .db_router import replica_configured
+from .utils.cache_utils import cache_is_shared
+
+
+@checks.register(checks.Tags.caches)
+def check_replica_cache(app_configs, **kwargs):
+    """Read-your-writes pins must be visible to every worker, or a user may read their stale data."""
+    if replica_configured() and not cache_is_shared():
+        return [checks.Error(
+            "DB_REPLICA_HOST is set but the default cache is local to each process, "
+            "so replica reads are disabled.",
+            hint="Set CACHE_URL to a cache shared by all workers, e.g. redis://redis:6379/0.",
+            id="transactions.E001",
+        )]
+    return []
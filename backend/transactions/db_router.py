@@ -0,0 +1,113 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .utils.cache_utils import cache_is_shared
+
+REPLICA_ALIAS = 'replica'
+PIN_KEY_PREFIX = "db-pin:"
+
+# Set while a view has opted its reads into the replica.
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+# Set as soon as anything in the current request writes to the primary.
+_wrote = contextvars.ContextVar('wrote', default=False)
+
+_query_counts = {}
+_counts_lock = threading.Lock()
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _pin_key(user):
+    return PIN_KEY_PREFIX + str(user.pk)
+
+
+def pin_to_primary(user):
+    """
+    Sends this user's replica reads to the primary for READ_YOUR_WRITES_SECONDS,
+    so data they just wrote is visible even if the replica lags behind.
+    """
+    cache.set(_pin_key(user), True, getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5))
+
+
+def is_pinned(user):
+    return bool(cache.get(_pin_key(user)))
+
+
+@contextmanager
+def replica_reads(request):
+    """
+    Routes reads inside the block to the replica, unless none is configured
+    or the requesting user wrote something recently. Pins are kept in Django's
+    cache, so without a cache shared by all workers reads stay on the primary.
+    """
+    enabled = replica_configured() and cache_is_shared() and not (
+        request.user.is_authenticated and is_pinned(request.user)
+    )
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextmanager
+def track_writes():
+    """Yields a callable telling whether the block wrote to the primary."""
+    token = _wrote.set(False)
+    try:
+        yield _wrote.get
+    finally:
+        _wrote.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes always go to the primary. Reads go to the replica only inside
+    replica_reads(); everything else keeps Django's default behaviour.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and not _wrote.get():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+def _count_queries(execute, sql, params, many, context):
+    alias = context['connection'].alias
+    with _counts_lock:
+        _query_counts[alias] = _query_counts.get(alias, 0) + 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver adding the per-alias counter once per connection."""
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def get_query_counts():
+    """Returns the number of queries this process sent to each database alias."""
+    with _counts_lock:
+        return dict(_query_counts)
+
+
+def reset_query_counts():
+    with _counts_lock:
+        _query_counts.clear()
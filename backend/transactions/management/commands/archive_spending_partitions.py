@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from transactions.models import SpendingAnomaly
+from transactions.utils import partition_utils
+
+
+class Command(BaseCommand):
+    help = (
+        "Detaches Spending partitions that end on or before a date. Detached tables keep "
+        "their data outside the ORM's reach until dropped (--drop) or re-attached by hand."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("before", type=date.fromisoformat, help="Cutoff date (YYYY-MM-DD).")
+        parser.add_argument("--drop", action="store_true", help="Drop the partitions instead of keeping them.")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the partitions that would be affected.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Spending partitioning requires PostgreSQL.")
+
+        with connection.cursor() as cursor:
+            if not partition_utils.is_partitioned(cursor):
+                raise CommandError("The Spending table is not partitioned.")
+            old = [p for p in partition_utils.list_partitions(cursor) if p[2] <= options["before"]]
+
+            for name, start, end in old:
+                if options["dry_run"]:
+                    self.stdout.write(f"Would {'drop' if options['drop'] else 'detach'} {name} ({start} to {end})")
+                    continue
+                with transaction.atomic():
+                    # Anomalies have no database constraint to the partitioned table, so clean them up here
+                    SpendingAnomaly.objects.filter(spending__date__gte=start, spending__date__lt=end).delete()
+                    cursor.execute(f'ALTER TABLE "{partition_utils.TABLE}" DETACH PARTITION "{name}"')
+                    if options["drop"]:
+                        cursor.execute(f'DROP TABLE "{name}"')
+                self.stdout.write(f"{'Dropped' if options['drop'] else 'Detached'} {name} ({start} to {end})")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(old)} partitions {'matched' if options['dry_run'] else 'archived'}."))
@@ -0,0 +1,88 @@
+import datetime
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from transactions.models import Category, Spending, User
+from transactions.serializers import (
+    CategoryListSerializer, CategorySerializer, SpendingListSerializer, SpendingSerializer,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the full ModelSerializer list path with the fast values() path for "
+        "spendings and categories: per-row cost and query count. Test data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Spendings to create and list.")
+        parser.add_argument("--categories", type=int, default=100, help="Categories to create and list.")
+
+    def measure(self, label, rows, serialize):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            data = serialize()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"  {label:<6} {elapsed * 1000:9.1f} ms  {elapsed / max(rows, 1) * 1e6:8.2f} us/row  {len(queries):6d} queries"
+        )
+        return data
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["rows"], options["categories"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows, category_count):
+        user = User.objects.create_user(
+            "bench-serialization", "bench-serialization@example.com", None, first_name="Bench", last_name="User"
+        )
+        parents = Category.objects.bulk_create(
+            [Category(name=f"Parent {i}", user=user) for i in range(max(category_count // 2, 1))]
+        )
+        children = Category.objects.bulk_create(
+            [Category(name=f"Child {i}", parent=parents[i % len(parents)], user=user)
+             for i in range(category_count - len(parents))]
+        )
+        categories = parents + children
+        today = datetime.date.today()
+        Spending.objects.bulk_create(
+            [
+                Spending(
+                    name=f"Spending {i}", description=f"Spending {i}", amount=f"{i % 500}.{i % 100:02d}",
+                    date=today - datetime.timedelta(days=i % 730), category=categories[i % len(categories)] if i % 5 else None,
+                    user=user,
+                )
+                for i in range(rows)
+            ],
+            batch_size=2000,
+        )
+        context = {"request": SimpleNamespace(user=user)}
+
+        spendings = Spending.objects.filter(user=user).order_by("-date")
+        self.stdout.write(f"Spendings ({rows} rows):")
+        full = self.measure("full", rows, lambda: SpendingSerializer(spendings.all(), many=True, context=context).data)
+        fast = self.measure("fast", rows, lambda: SpendingListSerializer(
+            spendings.values(*SpendingListSerializer.values), many=True).data)
+        if list(map(dict, full)) != list(fast):
+            raise CommandError("Fast spending serialization differs from SpendingSerializer.")
+
+        categories = Category.objects.filter(user=user).order_by("id")
+        self.stdout.write(f"Categories ({len(categories)} rows):")
+        full = self.measure("full", len(categories), lambda: CategorySerializer(categories.all(), many=True, context=context).data)
+        fast = self.measure("fast", len(categories), lambda: CategoryListSerializer(
+            categories.values(*CategoryListSerializer.values), many=True).data)
+        if list(map(dict, full)) != list(fast):
+            raise CommandError("Fast category serialization differs from CategorySerializer.")
+        self.stdout.write(self.style.SUCCESS("Outputs are identical."))
@@ -0,0 +1,84 @@
+import json
+import statistics
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max, Sum
+
+from transactions.models import Spending
+from transactions.utils import partition_utils
+
+
+def _scanned_relations(plan):
+    """Collects the Spending tables (parent or partitions) a JSON EXPLAIN plan reads."""
+    relations = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if node.get("Relation Name", "").startswith(partition_utils.TABLE):
+            relations.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return relations
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a date-filtered sum and list over Spending under EXPLAIN ANALYZE and reports "
+        "how many partitions were scanned and how long they took. Run it before and after "
+        "partitioning to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to query (default: the user with the most spendings).")
+        parser.add_argument("--days", type=int, default=30, help="Length of the date range, ending at the user's latest spending.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per query; the median is reported.")
+
+    def explain(self, queryset, repeat):
+        sql, params = queryset.query.sql_with_params()
+        runs = []
+        with connection.cursor() as cursor:
+            for _ in range(repeat):
+                cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+                result = cursor.fetchone()[0]
+                runs.append(json.loads(result)[0] if isinstance(result, str) else result[0])
+        relations = _scanned_relations(runs[-1]["Plan"])
+        return (
+            len(relations),
+            statistics.median(run["Planning Time"] for run in runs),
+            statistics.median(run["Execution Time"] for run in runs),
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark reads Postgres query plans and requires PostgreSQL.")
+
+        user_id = options["user"] or (
+            Spending.objects.order_by().values("user_id").annotate(n=Count("id")).order_by("-n")
+            .values_list("user_id", flat=True).first()
+        )
+        latest = Spending.objects.filter(user_id=user_id).aggregate(latest=Max("date"))["latest"]
+        if latest is None:
+            raise CommandError("No spendings to benchmark.")
+        start = latest - timedelta(days=options["days"])
+
+        with connection.cursor() as cursor:
+            partitioned = partition_utils.is_partitioned(cursor)
+            total = len(partition_utils.list_partitions(cursor)) + 1 if partitioned else 1
+
+        # The same shapes query_spendings runs
+        spendings = Spending.objects.filter(user_id=user_id, date__gte=start, date__lte=latest)
+        queries = {
+            "sum": spendings.order_by().values("user_id").annotate(total=Sum("amount")),
+            "list": spendings.order_by("-date").values_list("name", "amount", "date", "category__name"),
+        }
+
+        self.stdout.write(
+            f"{partition_utils.TABLE}: {'partitioned, ' + str(total) + ' partitions' if partitioned else 'not partitioned'}; "
+            f"user {user_id}, {start} to {latest}"
+        )
+        for label, queryset in queries.items():
+            scanned, planning, execution = self.explain(queryset, options["repeat"])
+            self.stdout.write(
+                f"  {label:<5} scanned {scanned}/{total} tables  planning {planning:.2f} ms  execution {execution:.2f} ms"
+            )
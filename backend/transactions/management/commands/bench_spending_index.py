@@ -0,0 +1,97 @@
+import hashlib
+import os
+import shutil
+import statistics
+import string
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.utils.embedding_utils import EMBEDDING_MODEL_NAME, SpendingIndex, embed_texts, unit_rows
+
+DIM = 384  # all-MiniLM-L6-v2's vector size
+
+
+def hashed_embed(texts):
+    """Stand-in for the model: a fixed random unit vector per text, so no model file is needed."""
+    vectors = np.empty((len(texts), DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+        vectors[i] = np.random.default_rng(seed).standard_normal(DIM)
+    return unit_rows(vectors)
+
+
+class Command(BaseCommand):
+    help = "Measures the spending name index's build rate and search latency on synthetic spendings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Spendings in the index (one user).")
+        parser.add_argument("--merchants", type=int, default=20_000, help="Distinct merchants among them.")
+        parser.add_argument("--chunk-size", type=int, default=10000, help="Spendings per add() call.")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument(
+            "--model", action="store_true",
+            help="Embed with the real model instead of hashed vectors (needs its file in backend/models).",
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        letters = np.array(list(string.ascii_uppercase))
+        merchants = [
+            "".join(rng.choice(letters, 6)) + " " + "".join(rng.choice(letters, 4))
+            for _ in range(options["merchants"])
+        ]
+        # Store numbers make most names unique while sharing a merchant key
+        picks = rng.integers(0, len(merchants), options["rows"])
+        stores = rng.integers(1, 10000, options["rows"])
+        rows = [(i + 1, f"{merchants[m]} #{s}") for i, (m, s) in enumerate(zip(picks, stores))]
+
+        embed = embed_texts if options["model"] else hashed_embed
+        root = tempfile.mkdtemp(prefix="spending_index_")
+        try:
+            index = SpendingIndex("bench", embed=embed, root=root)
+            start = time.perf_counter()
+            new_keys = 0
+            try:
+                for i in range(0, len(rows), options["chunk_size"]):
+                    new_keys += index.add(rows[i:i + options["chunk_size"]])
+            except ImportError:
+                raise CommandError("gpt4all is not installed; run without --model.")
+            build_s = time.perf_counter() - start
+            size = sum(os.path.getsize(os.path.join(index.dir, name)) for name in os.listdir(index.dir))
+
+            queries = [merchants[m].lower() for m in rng.integers(0, len(merchants), options["queries"])]
+            latencies, matches = [], []
+            for query in queries:
+                start = time.perf_counter()
+                # Hashed vectors only match their own text, so accept any score there
+                ids = index.search(query, min_score=0.5 if options["model"] else -1.0)
+                latencies.append(time.perf_counter() - start)
+                matches.append(len(ids))
+            embed_s = statistics.median(
+                timed(embed, [query]) for query in queries[:min(len(queries), 50)]
+            )
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+        latencies.sort()
+        source = EMBEDDING_MODEL_NAME if options["model"] else "hashed vectors"
+        self.stdout.write(f"{len(rows):,} spendings, {new_keys:,} merchant keys, embedded with {source}")
+        self.stdout.write(
+            f"  build        {build_s:8.2f}s  {len(rows) / build_s:,.0f} rows/s, {new_keys / build_s:,.0f} keys/s"
+        )
+        self.stdout.write(f"  index size   {size / 1024 / 1024:8.1f} MB")
+        self.stdout.write(
+            f"  search       median {1000 * statistics.median(latencies):.2f} ms, "
+            f"p95 {1000 * latencies[int(0.95 * (len(latencies) - 1))]:.2f} ms "
+            f"(query embedding {1000 * embed_s:.2f} ms of it), "
+            f"{statistics.mean(matches):,.0f} ids per query"
+        )
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
@@ -0,0 +1,49 @@
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from transactions.utils.bench_utils import run_cold_worker
+
+# Runs in a fresh interpreter so each measurement starts from a cold process
+WORKER_SCRIPT = """
+import json, sys, time
+
+mode, load_model = sys.argv[1], sys.argv[2] == "1"
+result = {}
+start = time.perf_counter()
+import django
+django.setup()
+import backend.urls  # pulls in every view, like a worker serving its first request
+result["django_setup_s"] = time.perf_counter() - start
+
+if mode == "llm":
+    start = time.perf_counter()
+    import gpt4all  # noqa: F401
+    result["gpt4all_import_s"] = time.perf_counter() - start
+    if load_model:
+        from transactions.utils.gpt_utils import get_gpt_handler
+        start = time.perf_counter()
+        get_gpt_handler()
+        result["model_load_s"] = time.perf_counter() - start
+
+from transactions.utils.bench_utils import peak_rss_mb
+result["max_rss_mb"] = peak_rss_mb()
+print(json.dumps(result))
+"""
+
+
+class Command(BaseCommand):
+    help = "Compares startup time and peak RSS of a CRUD-only worker against an LLM worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3, help="Cold starts per mode; the median is reported.")
+        parser.add_argument("--load-model", action="store_true", help="Also load the GPT4All model in the LLM worker.")
+
+    def handle(self, *args, **options):
+        for mode in ("crud", "llm"):
+            runs = [run_cold_worker(WORKER_SCRIPT, mode, int(options["load_model"]), label=f"{mode} worker") for _ in range(options["repeat"])]
+            self.stdout.write(f"{mode} worker (median of {len(runs)}):")
+            for metric in runs[0]:
+                value = statistics.median(run[metric] for run in runs)
+                unit = "MB" if metric.endswith("_mb") else "s"
+                self.stdout.write(f"  {metric:<18} {value:8.3f} {unit}")
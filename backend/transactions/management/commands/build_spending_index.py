@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.models import Spending
+from transactions.utils.embedding_utils import SpendingIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Adds spendings missing from the per-user name embedding index, e.g. rows created "
+        "with bulk_create() or before SPENDING_EMBEDDINGS was turned on, and drops deleted ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="users", help="Only index this user id. Repeatable.")
+        parser.add_argument("--rebuild", action="store_true", help="Delete each user's index and build it from scratch.")
+        parser.add_argument("--chunk-size", type=int, default=10000, help="Spendings fetched and indexed per batch.")
+
+    def handle(self, *args, **options):
+        users = options["users"] or list(
+            Spending.objects.order_by().values_list("user_id", flat=True).distinct()
+        )
+        start = time.perf_counter()
+        indexed = new_keys = removed = 0
+        try:
+            for user_id in users:
+                index = SpendingIndex(user_id)
+                if options["rebuild"]:
+                    index.clear()
+                known = index.indexed_ids()
+                rows = (
+                    Spending.objects.filter(user_id=user_id).order_by("id")
+                    .values_list("id", "name").iterator(chunk_size=options["chunk_size"])
+                )
+                chunk, seen = [], []
+                for row in rows:
+                    chunk.append(row)
+                    seen.append(row[0])
+                    if len(chunk) == options["chunk_size"]:
+                        indexed, new_keys = self.add(index, chunk, known, indexed, new_keys)
+                        chunk = []
+                indexed, new_keys = self.add(index, chunk, known, indexed, new_keys)
+                # Deletions made while SPENDING_EMBEDDINGS was off, or lost with an exiting process
+                stale = np.setdiff1d(known, np.array(seen, dtype=np.int64))
+                index.remove(stale)
+                removed += len(stale)
+        except ImportError:
+            raise CommandError("gpt4all is not installed; it provides the embedding model.")
+
+        elapsed = time.perf_counter() - start
+        rate = indexed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} spendings of {len(users)} users ({new_keys} new merchant keys embedded) "
+            f"in {elapsed:.2f}s ({rate:,.0f} rows/s); dropped {removed} deleted ones."
+        ))
+
+    def add(self, index, chunk, known, indexed, new_keys):
+        if len(known):
+            ids = np.array([spending_id for spending_id, _ in chunk], dtype=np.int64)
+            chunk = [row for row, seen in zip(chunk, np.isin(ids, known)) if not seen]
+        return indexed + len(chunk), new_keys + index.add(chunk)
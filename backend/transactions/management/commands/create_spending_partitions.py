@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from transactions.utils import partition_utils
+
+
+class Command(BaseCommand):
+    help = "Creates upcoming Spending partitions ahead of time (Postgres with SPENDING_PARTITION_INTERVAL only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=3, help="Intervals past the current one to create.")
+        parser.add_argument(
+            "--from", dest="start", type=date.fromisoformat,
+            help="Also create partitions back to this date (YYYY-MM-DD), moving their rows out of the default partition.",
+        )
+        parser.add_argument("--convert", action="store_true", help="Partition the Spending table first if it is not yet.")
+
+    def handle(self, *args, **options):
+        interval = settings.SPENDING_PARTITION_INTERVAL
+        if connection.vendor != "postgresql":
+            raise CommandError("Spending partitioning requires PostgreSQL.")
+        if interval not in partition_utils.INTERVALS:
+            raise CommandError("Set SPENDING_PARTITION_INTERVAL to 'month' or 'year'.")
+
+        with connection.cursor() as cursor:
+            if not partition_utils.is_partitioned(cursor):
+                if not options["convert"]:
+                    raise CommandError("The Spending table is not partitioned; rerun with --convert.")
+                with transaction.atomic():
+                    partition_utils.partition_table(cursor, interval, options["ahead"])
+                self.stdout.write(self.style.SUCCESS(f"Partitioned {partition_utils.TABLE} by {interval}."))
+
+            created = partition_utils.create_partitions(
+                cursor, interval, options["start"] or date.today(), options["ahead"]
+            )
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions created."))
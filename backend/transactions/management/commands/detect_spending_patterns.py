@@ -0,0 +1,114 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+
+from transactions.models import RecurringCharge, Spending, SpendingAnalysisState, SpendingAnomaly
+from transactions.utils.analytics_utils import detect_anomalies, detect_recurring, load_columns
+
+
+class Command(BaseCommand):
+    help = (
+        "Detects recurring charges and unusual spending amounts for every user whose "
+        "spendings changed since the last run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Re-analyze every user, changed or not.")
+        parser.add_argument("--batch-users", type=int, default=500, help="Users loaded and analyzed per batch.")
+        parser.add_argument("--chunk-size", type=int, default=10000, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        # Unconfirmed drafts from receipts stay out of the stats until confirmed
+        spendings = Spending.objects.filter(is_draft=False)
+        # (count, latest updated_at) per user; any insert, edit or delete changes it
+        fingerprints = {
+            row["user_id"]: (row["spending_count"], row["last_updated_at"])
+            for row in spendings.order_by().values("user_id").annotate(
+                spending_count=Count("id"), last_updated_at=Max("updated_at")
+            )
+        }
+        states = {
+            state.user_id: (state.spending_count, state.last_updated_at)
+            for state in SpendingAnalysisState.objects.all()
+        }
+        changed = [
+            user_id for user_id, fingerprint in fingerprints.items()
+            if options["full"] or states.get(user_id) != fingerprint
+        ]
+        emptied = [user_id for user_id in states if user_id not in fingerprints]
+
+        if emptied:
+            with transaction.atomic():
+                RecurringCharge.objects.filter(user_id__in=emptied).delete()
+                SpendingAnomaly.objects.filter(user_id__in=emptied).delete()
+                SpendingAnalysisState.objects.filter(user_id__in=emptied).delete()
+
+        rows_processed = recurring_found = anomalies_found = 0
+        batch_size = options["batch_users"]
+        for i in range(0, len(changed), batch_size):
+            batch = changed[i:i + batch_size]
+            rows = (
+                spendings.filter(user_id__in=batch)
+                .values_list("id", "user_id", "name", "date", "amount")
+                .iterator(chunk_size=options["chunk_size"])
+            )
+            columns = load_columns(rows)
+            recurring, in_recurring = detect_recurring(columns)
+            # Rent or subscriptions are expected, however large compared to other spendings
+            anomalies = detect_anomalies(columns, exclude=in_recurring)
+
+            with transaction.atomic():
+                RecurringCharge.objects.filter(user_id__in=batch).delete()
+                SpendingAnomaly.objects.filter(user_id__in=batch).delete()
+                RecurringCharge.objects.bulk_create([
+                    RecurringCharge(
+                        user_id=charge["user_id"],
+                        name=charge["name"],
+                        period_days=charge["period_days"],
+                        period_label=charge["period_label"],
+                        typical_amount=charge["typical_amount"],
+                        occurrences=charge["occurrences"],
+                        last_date=date.fromordinal(charge["last_day"]),
+                        next_expected_date=date.fromordinal(charge["next_expected_day"]),
+                    )
+                    for charge in recurring
+                ], batch_size=1000)
+                SpendingAnomaly.objects.bulk_create([
+                    SpendingAnomaly(
+                        user_id=anomaly["user_id"],
+                        spending_id=anomaly["spending_id"],
+                        z_score=anomaly["z_score"],
+                        reason=anomaly["reason"],
+                    )
+                    for anomaly in anomalies
+                ], batch_size=1000)
+                SpendingAnalysisState.objects.bulk_create(
+                    [
+                        SpendingAnalysisState(
+                            user_id=user_id,
+                            spending_count=fingerprints[user_id][0],
+                            last_updated_at=fingerprints[user_id][1],
+                        )
+                        for user_id in batch
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["user"],
+                    update_fields=["spending_count", "last_updated_at", "analyzed_at"],
+                )
+
+            rows_processed += len(columns["ids"])
+            recurring_found += len(recurring)
+            anomalies_found += len(anomalies)
+
+        elapsed = time.perf_counter() - start
+        rate = rows_processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Analyzed {len(changed)} changed users ({len(fingerprints) - len(changed)} unchanged): "
+            f"{recurring_found} recurring charges, {anomalies_found} anomalies. "
+            f"{rows_processed} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)."
+        ))
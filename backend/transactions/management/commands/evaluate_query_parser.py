@@ -0,0 +1,192 @@
+import json
+import statistics
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.utils.bench_utils import run_cold_worker
+
+CORPUS_PATH = Path(__file__).resolve().parents[2] / "eval" / "query_parser_corpus.json"
+
+# Fields scored separately; the two dates count as one range
+FIELDS = ("action", "category", "name", "date_range")
+
+# What parse_query returns when the model's output does not parse as JSON
+INVALID_JSON_ERROR = "Model did not return valid JSON."
+
+# Runs each backend in a fresh interpreter so load time and peak RSS are its own
+WORKER_SCRIPT = """
+import json, sys, time
+from datetime import date
+
+spec, corpus_path, limit = sys.argv[1], sys.argv[2], int(sys.argv[3])
+import django
+django.setup()
+from django.utils.module_loading import import_string
+
+result = {}
+start = time.perf_counter()
+if spec == "gpt4all" or spec.startswith("gpt4all:"):
+    from transactions.utils.gpt_utils import GPTQueryHandler, MODEL_NAME
+    parser = GPTQueryHandler(model_name=spec.partition(":")[2] or MODEL_NAME)
+else:
+    parser = import_string(spec)()
+result["load_s"] = time.perf_counter() - start
+if hasattr(parser, "warm_up"):
+    start = time.perf_counter()
+    parser.warm_up()
+    result["warm_up_s"] = time.perf_counter() - start
+
+with open(corpus_path) as f:
+    corpus = json.load(f)
+today = date.fromisoformat(corpus["today"])
+result["cases"] = []
+for case in corpus["cases"][:limit or None]:
+    start = time.perf_counter()
+    output = parser.parse_query(case["prompt"], today=today)
+    wall_s = time.perf_counter() - start
+    result["cases"].append({"output": output, "wall_s": wall_s, **getattr(parser, "last_timings", {})})
+
+from transactions.utils.bench_utils import peak_rss_mb
+result["max_rss_mb"] = peak_rss_mb()
+print(json.dumps(result, default=str))
+"""
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        return value  # kept as is, so it only matches an identical wrong value
+
+
+def normalize_intent(intent):
+    """Reduces an intent to comparable values: categories as a lowercase set, dates as ISO strings."""
+    category = intent.get("category") or "all"
+    if isinstance(category, str):
+        category = [category]
+    name = intent.get("name")
+    return {
+        "action": intent.get("action"),
+        "category": frozenset(str(c).strip().lower() for c in category) if isinstance(category, list) else category,
+        "name": str(name).strip().lower() or None if name else None,
+        "date_range": (_date(intent.get("start_date")), _date(intent.get("end_date"))),
+    }
+
+
+def score_case(expected, output):
+    """Returns {"valid_json", "exact", <field>: bool, ...}; fields are left out for prompts expected to fail."""
+    valid = isinstance(output, dict) and output.get("error") != INVALID_JSON_ERROR
+    if "error" in expected:
+        return {"valid_json": valid, "exact": valid and "error" in output}
+    if not valid or "error" in output:
+        scores = {field: False for field in FIELDS}
+    else:
+        wanted, got = normalize_intent(expected), normalize_intent(output)
+        scores = {field: wanted[field] == got[field] for field in FIELDS}
+    return {"valid_json": valid, "exact": all(scores.values()), **scores}
+
+
+def summarize(worker, scores):
+    def rate(key):
+        values = [score[key] for score in scores if key in score]
+        return sum(values) / len(values) if values else None
+
+    cases = worker["cases"]
+    tokens = sum(case.get("generated_tokens", 0) for case in cases)
+    walls = sorted(case["wall_s"] for case in cases)
+    metrics = {
+        "cases": len(cases),
+        "valid_json": rate("valid_json"),
+        **{field: rate(field) for field in FIELDS},
+        "exact": rate("exact"),
+        "load_s": worker["load_s"],
+        "warm_up_s": worker.get("warm_up_s"),
+        "query_median_s": statistics.median(walls) if walls else None,
+        "query_p95_s": walls[int(0.95 * (len(walls) - 1))] if walls else None,
+        "prompt_processing_median_s": None,
+        "ms_per_token": None,
+        "max_rss_mb": worker["max_rss_mb"],
+    }
+    if all("prompt_processing_s" in case for case in cases) and cases:
+        metrics["prompt_processing_median_s"] = statistics.median(case["prompt_processing_s"] for case in cases)
+    if tokens:
+        metrics["ms_per_token"] = 1000 * sum(case.get("generation_s", 0) for case in cases) / tokens
+    return metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the natural-language query corpus through one or more parser backends and "
+        "compares their accuracy, latency and memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend", action="append", dest="backends",
+            help=(
+                "'gpt4all' (the default model), 'gpt4all:<model file>', or the dotted path of a "
+                "callable returning an object with parse_query(prompt, today=...). Repeatable."
+            ),
+        )
+        parser.add_argument("--corpus", default=str(CORPUS_PATH), help="Corpus JSON file.")
+        parser.add_argument("--limit", type=int, default=0, help="Only run the first N prompts.")
+        parser.add_argument("--output", help="Write the full report, with every answer, to this JSON file.")
+        parser.add_argument("--compare", help="A report written by an earlier run to show alongside this one.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["corpus"]) as f:
+                corpus = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read corpus: {e}")
+        cases = corpus["cases"][:options["limit"] or None]
+
+        runs = []
+        for spec in options["backends"] or ["gpt4all"]:
+            self.stdout.write(f"Running {len(cases)} prompts through {spec}...")
+            worker = run_cold_worker(
+                WORKER_SCRIPT, spec, options["corpus"], options["limit"], label=f"{spec} backend"
+            )
+            scores = [score_case(case["expected"], answer["output"]) for case, answer in zip(cases, worker["cases"])]
+            runs.append({
+                "backend": spec,
+                "metrics": summarize(worker, scores),
+                "cases": [
+                    {"prompt": case["prompt"], "expected": case["expected"], **answer, "scores": score}
+                    for case, answer, score in zip(cases, worker["cases"], scores)
+                ],
+            })
+
+        report = {"corpus_version": corpus["version"], "today": corpus["today"], "runs": runs}
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2, default=str)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        columns = [(run["backend"], run["metrics"]) for run in runs]
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                previous = json.load(f)
+            if previous.get("corpus_version") != corpus["version"]:
+                self.stderr.write("The compared report used another corpus version; scores may not be comparable.")
+            columns += [(f"{run['backend']} (previous)", run["metrics"]) for run in previous["runs"]]
+        self.write_table(columns)
+
+    def write_table(self, columns):
+        width = max(len(name) for name, _ in columns) + 2
+        self.stdout.write(" " * 28 + "".join(f"{name:>{width}}" for name, _ in columns))
+        for metric in columns[0][1]:
+            cells = []
+            for _, metrics in columns:
+                value = metrics.get(metric)
+                if value is None:
+                    cells.append(f"{'-':>{width}}")
+                elif metric in ("valid_json", "exact") or metric in FIELDS:
+                    cells.append(f"{value:>{width}.1%}")
+                elif isinstance(value, int):
+                    cells.append(f"{value:>{width}d}")
+                else:
+                    cells.append(f"{value:>{width}.3f}")
+            self.stdout.write(f"  {metric:<26}" + "".join(cells))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from transactions.models import ReceiptUpload
+from transactions.utils.upload_utils import discard
+
+
+class Command(BaseCommand):
+    help = "Deletes chunked receipt uploads, and their partial files, abandoned for RECEIPT_UPLOAD_EXPIRY_HOURS."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=settings.RECEIPT_UPLOAD_EXPIRY_HOURS)
+        expired = 0
+        for upload in ReceiptUpload.objects.filter(updated_at__lt=cutoff).iterator():
+            discard(upload)
+            expired += 1
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} abandoned uploads."))
@@ -0,0 +1,115 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from transactions.models import Receipt, Spending
+from transactions.utils.gpt_utils import get_gpt_handler, receipt_batches
+from transactions.utils.receipt_utils import describe_items, extract_heuristic, merge_model_result
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates draft spendings from receipts' parsed_text. Regex heuristics run first; "
+        "only ambiguous receipts go to the local model, several per prompt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=4,
+            help="Most receipts per model prompt; fewer when they would not fit its context window.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500, help="Receipts loaded and saved per pass.")
+        parser.add_argument("--limit", type=int, help="Process at most this many receipts.")
+        parser.add_argument("--no-model", action="store_true", help="Skip the model; ambiguous receipts keep heuristic results.")
+
+    def handle(self, *args, **options):
+        pending = (
+            Receipt.objects.filter(extracted_at__isnull=True, parsed_text__isnull=False)
+            .exclude(parsed_text="").order_by("id")
+        )
+
+        handler = None
+        if not options["no_model"]:
+            try:
+                handler = get_gpt_handler()
+            except Exception as e:
+                # ImportError without gpt4all, others e.g. when the model file is missing
+                self.stderr.write(f"Model unavailable ({e}); ambiguous receipts keep heuristic results.")
+
+        timings = {"heuristics": 0.0, "model": 0.0, "save": 0.0}
+        total = ambiguous_count = sent_to_model = unusable = unusable_batches = created = 0
+        last_id = 0
+        while True:
+            # Paged by id, so only one chunk of parsed_text is in memory at a time
+            size = options["chunk_size"]
+            if options["limit"]:
+                size = min(size, options["limit"] - total)
+                if size <= 0:
+                    break
+            chunk = list(
+                pending.filter(id__gt=last_id).values_list("id", "user_id", "parsed_text", "created_at")[:size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            total += len(chunk)
+
+            start = time.perf_counter()
+            results = [extract_heuristic(text) for _, _, text, _ in chunk]
+            timings["heuristics"] += time.perf_counter() - start
+
+            ambiguous = [n for n, result in enumerate(results) if result["ambiguous"]]
+            ambiguous_count += len(ambiguous)
+            if handler and ambiguous:
+                start = time.perf_counter()
+                texts = [chunk[n][2] for n in ambiguous]
+                for positions in receipt_batches(texts, options["batch_size"]):
+                    batch = [ambiguous[p] for p in positions]
+                    answers = handler.extract_receipts([texts[p] for p in positions])
+                    if all(answer is None for answer in answers):
+                        unusable += len(batch)
+                        unusable_batches += 1
+                    for n, answer in zip(batch, answers):
+                        results[n] = merge_model_result(results[n], answer)
+                timings["model"] += time.perf_counter() - start
+                sent_to_model += len(ambiguous)
+
+            start = time.perf_counter()
+            spendings = []
+            for (receipt_id, user_id, _, created_at), result in zip(chunk, results):
+                if result["total"] is None:
+                    continue  # nothing to record; the receipt stays without a spending
+                name = result["merchant"] or f"Receipt {receipt_id}"
+                spendings.append(Spending(
+                    name=name,
+                    description=describe_items(result["items"]) or name,
+                    amount=result["total"],
+                    # Receipts are usually uploaded the day of the purchase
+                    date=result["date"] or created_at.date(),
+                    user_id=user_id,
+                    receipt_id=receipt_id,
+                    is_draft=True,
+                ))
+            with transaction.atomic():
+                Spending.objects.bulk_create(spendings, batch_size=1000)
+                Receipt.objects.filter(id__in=[receipt[0] for receipt in chunk]).update(extracted_at=timezone.now())
+            timings["save"] += time.perf_counter() - start
+            created += len(spendings)
+
+        self.stdout.write(f"Receipts processed: {total}, draft spendings created: {created}")
+        share = f" ({ambiguous_count / total:.0%})" if total else ""
+        self.stdout.write(
+            f"Needed the model: {ambiguous_count}{share}, sent to it: {sent_to_model}, "
+            f"answered: {sent_to_model - unusable}"
+        )
+        if unusable:
+            self.stderr.write(
+                f"The model returned unusable output for {unusable_batches} batches ({unusable} receipts); "
+                "they keep heuristic results."
+            )
+        for stage, handled in (("heuristics", total), ("model", sent_to_model), ("save", created)):
+            elapsed = timings[stage]
+            rate = f"{handled / elapsed:,.0f}/s" if elapsed else "-"
+            self.stdout.write(f"  {stage:<10} {handled:7d} in {elapsed:7.2f}s  {rate}")
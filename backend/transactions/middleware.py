@@ -0,0 +1,20 @@
+from .db_router import pin_to_primary, replica_configured, track_writes
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins a user to the primary database for a short window after any request
+    that wrote data, so their next reads never hit a lagging replica.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_writes() as wrote:
+            response = self.get_response(request)
+            # DRF copies the token-authenticated user back onto the Django request
+            user = getattr(request, 'user', None)
+            if wrote() and replica_configured() and user is not None and user.is_authenticated:
+                pin_to_primary(user)
+        return response
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.3 on 2026-10-19 11:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_receipt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingAnalysisState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='spending_analysis_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('spending_count', models.PositiveIntegerField()),
+                ('last_updated_at', models.DateTimeField(null=True)),
+                ('analyzed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='spending',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='RecurringCharge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the most recent matching spending.', max_length=100)),
+                ('period_days', models.FloatField(help_text='Average number of days between charges.')),
+                ('period_label', models.CharField(max_length=20)),
+                ('typical_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('occurrences', models.PositiveIntegerField()),
+                ('last_date', models.DateField()),
+                ('next_expected_date', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_charges', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SpendingAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('z_score', models.FloatField()),
+                ('reason', models.CharField(max_length=100)),
+                ('spending', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly', to='transactions.spending')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_anomalies', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
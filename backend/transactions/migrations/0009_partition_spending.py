@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from transactions.utils import partition_utils
+
+
+def partition_spending(apps, schema_editor):
+    """Only runs on Postgres with SPENDING_PARTITION_INTERVAL set; otherwise a no-op."""
+    interval = getattr(settings, 'SPENDING_PARTITION_INTERVAL', None)
+    if not interval or schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not partition_utils.is_partitioned(cursor):
+            partition_utils.partition_table(cursor, interval)
+
+
+def unpartition_spending(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if partition_utils.is_partitioned(cursor):
+            partition_utils.unpartition_table(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_spending_updated_at_recurringcharge_and_more'),
+    ]
+
+    operations = [
+        # Postgres cannot reference a partitioned table by id alone
+        migrations.AlterField(
+            model_name='spendinganomaly',
+            name='spending',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='anomaly', to='transactions.spending'),
+        ),
+        migrations.RunPython(partition_spending, unpartition_spending),
+    ]
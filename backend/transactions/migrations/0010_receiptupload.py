@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-19 12:05
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_partition_spending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField(help_text='Total size of the file in bytes.')),
+                ('sha256', models.CharField(help_text='Hex SHA-256 of the whole file, checked on finalize.', max_length=64)),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='Bytes received so far.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipt_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-19 12:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0010_receiptupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='extracted_at',
+            field=models.DateTimeField(blank=True, help_text='When extract_receipt_spendings processed parsed_text.', null=True),
+        ),
+        migrations.AddField(
+            model_name='spending',
+            name='is_draft',
+            field=models.BooleanField(default=False, help_text='Extracted from a receipt and not yet confirmed by the user.'),
+        ),
+        migrations.AddField(
+            model_name='spending',
+            name='receipt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='spendings', to='transactions.receipt'),
+        ),
+    ]
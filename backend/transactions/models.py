@@ -1,4 +1,8 @@
+import uuid
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractUser
 from .managers import UserManager
@@ -55,6 +59,9 @@ class Spending(models.Model):
     date = models.DateField()
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name="spendings")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="spendings")
+    receipt = models.ForeignKey('Receipt', on_delete=models.SET_NULL, null=True, blank=True, related_name="spendings")
+    is_draft = models.BooleanField(default=False, help_text="Extracted from a receipt and not yet confirmed by the user.")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def display_category(self):
         """
@@ -86,7 +93,69 @@ class Receipt(models.Model):
 
     # Future fields for ML parsing results
     parsed_text = models.TextField(blank=True, null=True)
+    extracted_at = models.DateTimeField(null=True, blank=True, help_text="When extract_receipt_spendings processed parsed_text.")
     # e.g., predicted_category = models.ForeignKey(Category, ...)
 
     def __str__(self):
-        return f"Receipt {self.id} for {self.user.username}"
\ No newline at end of file
+        return f"Receipt {self.id} for {self.user.username}"
+
+class ReceiptUpload(models.Model):
+    """
+    A chunked, resumable receipt upload in progress. Chunks are appended to
+    a partial file on disk; finalizing turns it into a Receipt.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="receipt_uploads")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Total size of the file in bytes.")
+    sha256 = models.CharField(max_length=64, help_text="Hex SHA-256 of the whole file, checked on finalize.")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def is_expired(self):
+        return self.updated_at < timezone.now() - timedelta(hours=settings.RECEIPT_UPLOAD_EXPIRY_HOURS)
+
+    def __str__(self):
+        return f"Upload {self.id} of {self.filename} ({self.offset}/{self.size} bytes)"
+
+class RecurringCharge(models.Model):
+    """
+    A charge that repeats at a regular interval (e.g., monthly rent), found by
+    the detect_spending_patterns command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="recurring_charges")
+    name = models.CharField(max_length=100, help_text="Name of the most recent matching spending.")
+    period_days = models.FloatField(help_text="Average number of days between charges.")
+    period_label = models.CharField(max_length=20)  # e.g., "monthly"
+    typical_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    occurrences = models.PositiveIntegerField()
+    last_date = models.DateField()
+    next_expected_date = models.DateField()
+
+    def __str__(self):
+        return f"{self.name} - ${self.typical_amount} {self.period_label}"
+
+class SpendingAnomaly(models.Model):
+    """
+    A spending whose amount is unusual for its user, found by the
+    detect_spending_patterns command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="spending_anomalies")
+    # No database constraint: Postgres cannot reference a partitioned Spending table by id alone
+    spending = models.OneToOneField(Spending, on_delete=models.CASCADE, related_name="anomaly", db_constraint=False)
+    z_score = models.FloatField()
+    reason = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f"Anomaly for spending {self.spending_id}: {self.reason}"
+
+class SpendingAnalysisState(models.Model):
+    """
+    Snapshot of a user's spendings at the last analysis run, used to skip
+    users whose data has not changed since.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="spending_analysis_state")
+    spending_count = models.PositiveIntegerField()
+    last_updated_at = models.DateTimeField(null=True)
+    analyzed_at = models.DateTimeField(auto_now=True)
@@ -1,14 +1,43 @@
 from rest_framework import serializers
-from .models import Spending, Category, User, Receipt
+from .models import Spending, Category, User, Receipt, ReceiptUpload, RecurringCharge, SpendingAnomaly
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from rest_framework.exceptions import ValidationError
 from django.db import IntegrityError
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.text import get_valid_filename
+import os
+import re
 
 class ReceiptSerializer(serializers.ModelSerializer):
     class Meta:
         model = Receipt
-        fields = ['id', 'image', 'parsed_text', 'created_at']
-        read_only_fields = ['id', 'parsed_text', 'created_at']
+        fields = ['id', 'image', 'parsed_text', 'created_at', 'extracted_at']
+        read_only_fields = ['id', 'parsed_text', 'created_at', 'extracted_at']
+
+class ReceiptUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReceiptUpload
+        fields = ['id', 'filename', 'size', 'sha256', 'offset', 'created_at']
+        read_only_fields = ['id', 'offset', 'created_at']
+
+    def validate_size(self, value):
+        if value <= 0 or value > settings.RECEIPT_UPLOAD_MAX_SIZE:
+            raise ValidationError(f"Size must be between 1 and {settings.RECEIPT_UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def validate_sha256(self, value):
+        if not re.fullmatch(r"[0-9a-fA-F]{64}", value):
+            raise ValidationError("Must be a hex SHA-256 digest.")
+        return value.lower()
+
+    def validate_filename(self, value):
+        # Names like ".." or "dir/" would only fail once the whole file is uploaded
+        try:
+            get_valid_filename(os.path.basename(value))
+        except SuspiciousFileOperation:
+            raise ValidationError("Not a valid file name.")
+        return value
 
 class CustomRegisterSerializer(RegisterSerializer):
     first_name = serializers.CharField(required=True)
@@ -91,6 +120,51 @@ class CategorySerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class CategoryListSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path for listing categories. Takes rows from
+    queryset.values(*CategoryListSerializer.values), with the parent name
+    joined in, and returns the same shape as CategorySerializer.
+    """
+    values = ('id', 'name', 'parent', 'parent__name', 'user')
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'parent': row['parent'],
+            'parent_name': row['parent__name'],
+            'user': row['user'],
+        }
+
+
+class SpendingListSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path for listing spendings. Takes rows from
+    queryset.values(*SpendingListSerializer.values), with the category name
+    joined in, and returns the same shape as SpendingSerializer.
+    """
+    values = ('id', 'description', 'name', 'amount', 'date', 'category', 'category__name', 'user', 'receipt', 'is_draft')
+
+    # Shared field instances keep number and date formatting identical to SpendingSerializer
+    amount_field = serializers.DecimalField(max_digits=12, decimal_places=2)
+    date_field = serializers.DateField()
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'description': row['description'],
+            'name': row['name'],
+            'amount': self.amount_field.to_representation(row['amount']),
+            'date': self.date_field.to_representation(row['date']),
+            'category': row['category'],
+            'category_name': row['category__name'],
+            'user': row['user'],
+            'receipt': row['receipt'],
+            'is_draft': row['is_draft'],
+        }
+
+
 class SpendingSerializer(serializers.ModelSerializer):
     """
     Serializer for Spending model. 
@@ -109,8 +183,8 @@ class SpendingSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Spending
-        fields = ['id', 'description', 'name', 'amount', 'date', 'category', 'category_name', 'user']
-        read_only_fields = ['id', 'user', 'category_name']
+        fields = ['id', 'description', 'name', 'amount', 'date', 'category', 'category_name', 'user', 'receipt', 'is_draft']
+        read_only_fields = ['id', 'user', 'category_name', 'receipt']
 
     def __init__(self, *args, **kwargs):
         """Dynamically restrict 'category' choices to the current user's categories."""
@@ -136,4 +210,20 @@ class SpendingSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        return super().update(instance, validated_data)
\ No newline at end of file
+        return super().update(instance, validated_data)
+
+class RecurringChargeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecurringCharge
+        fields = ['id', 'name', 'period_days', 'period_label', 'typical_amount', 'occurrences', 'last_date', 'next_expected_date']
+        read_only_fields = fields
+
+class SpendingAnomalySerializer(serializers.ModelSerializer):
+    name = serializers.ReadOnlyField(source='spending.name')
+    amount = serializers.DecimalField(source='spending.amount', max_digits=12, decimal_places=2, read_only=True)
+    date = serializers.ReadOnlyField(source='spending.date')
+
+    class Meta:
+        model = SpendingAnomaly
+        fields = ['id', 'spending', 'name', 'amount', 'date', 'z_score', 'reason']
+        read_only_fields = fields
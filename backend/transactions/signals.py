@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token
+from .models import Spending
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Logout through dj_rest_auth deletes the token, so this covers logout too."""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """
+    Any user save (password change, deactivation, profile edit) drops the
+    cached copy so the next request sees the fresh user row.
+    """
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+@receiver(post_save, sender=Spending)
+def index_spending_name(sender, instance, created, **kwargs):
+    """bulk_create() sends no signal; build_spending_index covers those rows."""
+    if not settings.SPENDING_EMBEDDINGS:
+        return
+    # Imported here so processes without the index never load NumPy
+    from .utils.embedding_utils import queue_for_index
+
+    queue_for_index(instance, created)
+
+
+@receiver(post_delete, sender=Spending)
+def unindex_deleted_spending(sender, instance, **kwargs):
+    if not settings.SPENDING_EMBEDDINGS:
+        return
+    from .utils.embedding_utils import queue_for_removal
+
+    queue_for_removal(instance)
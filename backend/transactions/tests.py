@@ -1,3 +1,285 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import tempfile
+import zlib
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import checks
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import CachedTokenAuthentication
+from .db_router import REPLICA_ALIAS, get_query_counts, replica_configured, reset_query_counts
+from .models import Receipt, Spending, User
+from .utils import embedding_utils
+from .utils.analytics_utils import detect_anomalies, detect_recurring, load_columns
+from .utils.gpt_utils import RECEIPT_TEXT_LIMIT, receipt_batches
+from .utils.receipt_utils import extract_heuristic, merge_model_result
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", "alice@example.com", "pw", first_name="A", last_name="B")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("category-list")
+
+    def test_cached_token_authenticates(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_logout_revokes_cached_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.client.post(reverse("rest_logout"))
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deactivation_revokes_cached_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_requests_do_not_share_the_cached_user(self):
+        authentication = CachedTokenAuthentication()
+        user, _ = authentication.authenticate_credentials(self.token.key)
+        # e.g. a profile update that fails validation after assigning fields
+        user.first_name = "Mallory"
+        user.set_password("changed")
+        next_user, _ = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(next_user.first_name, "A")
+        self.assertTrue(next_user.check_password("pw"))
+
+
+SHARED_CACHE = {"default": {
+    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+    "LOCATION": tempfile.mkdtemp(),
+}}
+LOCAL_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@skipUnless(replica_configured(), "needs a 'replica' database alias")
+class ReplicaRoutingTests(TransactionTestCase):
+    """Committed rows, since the mirrored replica alias reads through its own connection."""
+
+    # The test runner needs every listed alias to exist, even for skipped tests
+    databases = {"default", REPLICA_ALIAS} if replica_configured() else {"default"}
+
+    def setUp(self):
+        self.user = User.objects.create_user("bob", "bob@example.com", "pw", first_name="B", last_name="C")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("spending-list")
+
+    def replica_queries(self, method, *args, **kwargs):
+        reset_query_counts()
+        getattr(self.client, method)(*args, **kwargs)
+        return get_query_counts().get(REPLICA_ALIAS, 0)
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_reads_go_to_replica_until_user_writes(self):
+        self.assertGreater(self.replica_queries("get", self.url), 0)
+        self.client.post(self.url, {"name": "Rent", "amount": "900.00", "date": "2025-01-01"}, format="json")
+        self.assertEqual(self.replica_queries("get", self.url), 0)
+
+    @override_settings(CACHES=LOCAL_CACHE)
+    def test_local_cache_keeps_reads_on_primary(self):
+        self.assertEqual(self.replica_queries("get", self.url), 0)
+        self.assertEqual([error.id for error in checks.run_checks(tags=[checks.Tags.caches])], ["transactions.E001"])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ChunkedReceiptUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("carol", "carol@example.com", "pw", first_name="C", last_name="D")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        image = io.BytesIO()
+        Image.new("RGB", (4, 4)).save(image, "PNG")
+        self.data = image.getvalue()
+
+    def start(self, filename):
+        return self.client.post(reverse("start_receipt_upload"), {
+            "filename": filename, "size": len(self.data), "sha256": hashlib.sha256(self.data).hexdigest(),
+        }, format="json")
+
+    def put(self, upload_id, offset, chunk):
+        return self.client.generic(
+            "PUT", reverse("receipt_upload_chunk", args=[upload_id]), chunk,
+            content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_resumable_upload_creates_receipt(self):
+        upload_id = self.start("photo.png").data["id"]
+        self.assertEqual(self.put(upload_id, 0, self.data[:10]).data["offset"], 10)
+        self.assertEqual(self.put(upload_id, 0, self.data[10:]).status_code, 409)
+        self.assertEqual(self.put(upload_id, 10, self.data[10:]).data["offset"], len(self.data))
+        response = self.client.post(reverse("finalize_receipt_upload", args=[upload_id]))
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Receipt.objects.get(id=response.data["id"]).image.name.startswith("receipts/photo"))
+
+    def test_unusable_filenames_are_rejected_up_front(self):
+        for filename in ("..", "dir/"):
+            self.assertEqual(self.start(filename).status_code, 400)
+
+
+class SpendingPatternTests(SimpleTestCase):
+    def columns(self, extra=()):
+        rows = [(i + 1, "alice", "RENT PAYMENT", date(2024, 1 + i, 1), Decimal("1500.00")) for i in range(6)]
+        rows += [(100 + i, "alice", f"Cafe {i}", date(2024, 1, 1) + timedelta(days=i * 11), Decimal(10 + i % 5))
+                 for i in range(15)]
+        return load_columns(rows + list(extra))
+
+    def test_monthly_rent_is_recurring_and_not_an_anomaly(self):
+        columns = self.columns()
+        recurring, in_recurring = detect_recurring(columns)
+        self.assertEqual([(charge["name"], charge["period_label"]) for charge in recurring], [("RENT PAYMENT", "monthly")])
+        self.assertEqual(in_recurring.sum(), 6)
+        self.assertEqual(detect_anomalies(columns, exclude=in_recurring), [])
+
+    def test_single_outlier_is_flagged(self):
+        columns = self.columns([(999, "alice", "TV store", date(2024, 3, 3), Decimal("900.00"))])
+        _, in_recurring = detect_recurring(columns)
+        anomalies = detect_anomalies(columns, exclude=in_recurring)
+        self.assertEqual([anomaly["spending_id"] for anomaly in anomalies], [999])
+
+
+RECEIPT = """SAFEWAY
+Store #123  Tel 604-555-1234
+01/15/2025 14:32
+MILK 2%          4.99
+BREAD            3.49 F
+SUBTOTAL         8.48
+GST              0.42
+TOTAL            8.90
+VISA             8.90"""
+
+
+class ReceiptExtractionTests(SimpleTestCase):
+    def test_sample_receipt(self):
+        result = extract_heuristic(RECEIPT)
+        self.assertEqual(result["merchant"], "SAFEWAY")
+        self.assertEqual(result["date"], date(2025, 1, 15))
+        self.assertEqual(result["total"], Decimal("8.90"))
+        self.assertEqual([item["name"] for item in result["items"]], ["MILK 2%", "BREAD"])
+        self.assertFalse(result["ambiguous"])
+
+    def test_subtotal_is_not_the_total(self):
+        result = extract_heuristic("SAFEWAY\n2025-01-15\nMILK 4.99\nSUBTOTAL 4.99\nTAX 0.25")
+        self.assertIsNone(result["total"])
+        self.assertTrue(result["ambiguous"])
+
+    def test_model_only_fills_gaps(self):
+        result = extract_heuristic("SAFEWAY\nMILK 4.99\nTOTAL 4.99")
+        merged = merge_model_result(result, {"merchant": "Other", "date": "2025-01-15", "total": "99.00"})
+        self.assertEqual((merged["merchant"], merged["date"], merged["total"]),
+                         ("SAFEWAY", date(2025, 1, 15), Decimal("4.99")))
+
+
+class ReceiptBatchTests(SimpleTestCase):
+    def test_long_receipts_are_split_to_fit_the_context(self):
+        texts = ["4.99\n" * RECEIPT_TEXT_LIMIT] * 4
+        batches = list(receipt_batches(texts, max_size=4))
+        self.assertEqual(sum(batches, []), [0, 1, 2, 3])
+        self.assertLess(max(map(len, batches)), 4)
+
+    def test_short_receipts_share_a_batch(self):
+        self.assertEqual(list(receipt_batches(["TOTAL 1.00"] * 5, max_size=4)), [[0, 1, 2, 3], [4]])
+
+
+class ExtractReceiptSpendingsTests(TestCase):
+    def test_pages_through_receipts_up_to_the_limit(self):
+        user = User.objects.create_user("gina", "gina@example.com", "pw", first_name="G", last_name="H")
+        receipts = [Receipt.objects.create(user=user, image="receipts/r.png", parsed_text=RECEIPT) for _ in range(5)]
+        call_command("extract_receipt_spendings", "--no-model", "--chunk-size", "2", "--limit", "3", stdout=io.StringIO())
+        extracted = Receipt.objects.filter(extracted_at__isnull=False).order_by("id")
+        self.assertEqual(list(extracted), receipts[:3])
+        self.assertEqual(Spending.objects.filter(is_draft=True).count(), 3)
+
+
+class DraftSpendingTests(TestCase):
+    def test_drafts_are_left_out_of_exports(self):
+        user = User.objects.create_user("dave", "dave@example.com", "pw", first_name="D", last_name="E")
+        Spending.objects.create(user=user, name="Rent", amount=900, date=date(2025, 1, 1))
+        Spending.objects.create(user=user, name="SAFEWAY", amount=8.9, date=date(2025, 1, 15), is_draft=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        body = b"".join(client.get(reverse("export_spendings"), {"type": "csv"}).streaming_content).decode()
+        self.assertIn("Rent", body)
+        self.assertNotIn("SAFEWAY", body)
+
+
+class GzipExportTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("frank", "frank@example.com", "pw", first_name="F", last_name="G")
+        Spending.objects.create(user=user, name="Rent", amount=900, date=date(2025, 1, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def export(self, accept_encoding):
+        return self.client.get(reverse("export_spendings"), {"type": "csv"}, HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    def test_streamed_body_is_gzip(self):
+        response = self.export("br, gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        chunks = list(response.streaming_content)
+        # The header row is flushed on its own, before any row is fetched
+        self.assertIn(b"name", zlib.decompressobj(wbits=31).decompress(chunks[0]))
+        self.assertIn(b"Rent", gzip.decompress(b"".join(chunks)))
+
+    def test_refused_gzip_is_not_used(self):
+        for accept_encoding in ("gzip;q=0", "identity", "gzip; q=0.0, *;q=0"):
+            response = self.export(accept_encoding)
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertIn(b"Rent", b"".join(response.streaming_content))
+
+
+class FakeEmbedder:
+    def embed(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@override_settings(SPENDING_EMBEDDINGS=True, SPENDING_INDEX_DIR=tempfile.mkdtemp())
+class SpendingIndexQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("erin", "erin@example.com", "pw", first_name="E", last_name="F")
+        patcher = mock.patch.object(embedding_utils, "get_embedder", return_value=FakeEmbedder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, name, **kwargs):
+        return Spending.objects.create(user=self.user, name=name, amount=1, date=date(2025, 1, 1), **kwargs)
+
+    def test_rolled_back_saves_are_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    # An id SQLite will not reuse, as Postgres sequences never do
+                    self.create("Rolled back", id=1000)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            kept = self.create("Kept")
+        embedding_utils._executor.submit(lambda: None).result()  # wait for the background writer
+        index = embedding_utils.SpendingIndex(self.user.pk)
+        self.assertEqual(index.indexed_ids().tolist(), [kept.id])
+        index.clear()
+
+    def test_deleted_spendings_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            kept, deleted = self.create("Kept"), self.create("Deleted")
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+        embedding_utils._executor.submit(lambda: None).result()
+        index = embedding_utils.SpendingIndex(self.user.pk)
+        self.assertEqual(index.indexed_ids().tolist(), [kept.id])
+        self.assertEqual(index.search("kept", min_score=-1.0).tolist(), [kept.id])
+        index.clear()
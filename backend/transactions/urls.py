@@ -1,13 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SpendingViewSet, CategoryViewSet, query_spendings, upload_receipt
+from .views import SpendingViewSet, CategoryViewSet, RecurringChargeViewSet, SpendingAnomalyViewSet, query_spendings, upload_receipt, export_spendings, start_receipt_upload, receipt_upload_chunk, finalize_receipt_upload
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'spendings', SpendingViewSet, basename='spending')
+router.register(r'recurring-charges', RecurringChargeViewSet, basename='recurring-charge')
+router.register(r'anomalies', SpendingAnomalyViewSet, basename='anomaly')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('gpt-query/', query_spendings, name='gpt_query'),
     path('upload-receipt/', upload_receipt, name='upload_receipt'),
+    path('upload-receipt/chunked/', start_receipt_upload, name='start_receipt_upload'),
+    path('upload-receipt/chunked/<uuid:upload_id>/', receipt_upload_chunk, name='receipt_upload_chunk'),
+    path('upload-receipt/chunked/<uuid:upload_id>/finalize/', finalize_receipt_upload, name='finalize_receipt_upload'),
+    path('export/', export_spendings, name='export_spendings'),
 ]
\ No newline at end of file
@@ -0,0 +1,172 @@
+import re
+
+import numpy as np
+
+# Known billing periods in days, matched against the average gap between charges
+PERIODS = np.array([7.0, 14.0, 30.44, 91.31, 365.25])
+PERIOD_LABELS = ["weekly", "biweekly", "monthly", "quarterly", "yearly"]
+
+MIN_OCCURRENCES = 3      # charges needed before something counts as recurring
+PERIOD_TOLERANCE = 0.15  # max relative distance from the nearest known period
+MAX_INTERVAL_CV = 0.2    # max std/mean of the gaps between charges
+MAX_AMOUNT_CV = 0.5      # max std/mean of the charged amounts (bills vary a bit)
+
+MIN_ANOMALY_HISTORY = 10  # spendings a user needs before amounts are judged
+Z_THRESHOLD = 3.0
+IQR_FACTOR = 3.0
+
+_MERCHANT_NOISE = re.compile(r"[^a-z]+")
+
+
+def normalize_merchant(name):
+    """
+    Reduces a spending name to a merchant key by dropping digits, symbols and
+    case, e.g. "Uber *Trip 1234" -> "uber trip".
+    """
+    return " ".join(_MERCHANT_NOISE.sub(" ", name.lower()).split())
+
+
+def load_columns(rows):
+    """
+    Turns (id, user_id, name, date, amount) rows into NumPy columns.
+    Dates become day ordinals and amounts float64.
+    """
+    ids, users, names, days, amounts = [], [], [], [], []
+    for spending_id, user_id, name, date, amount in rows:
+        ids.append(spending_id)
+        users.append(user_id)
+        names.append(name)
+        days.append(date.toordinal())
+        amounts.append(float(amount))
+    return {
+        "ids": np.array(ids, dtype=np.int64),
+        "users": np.array(users, dtype=object),
+        "names": np.array(names, dtype=object),
+        "days": np.array(days, dtype=np.int64),
+        "amounts": np.array(amounts, dtype=np.float64),
+    }
+
+
+def _group_bounds(keys):
+    """For keys sorted into runs, returns each row's group index, group starts and sizes."""
+    new_group = np.empty(len(keys), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(new_group)
+    counts = np.diff(np.append(starts, len(keys)))
+    return np.cumsum(new_group) - 1, starts, counts
+
+
+def _mean_std(groups, values, counts):
+    mean = np.bincount(groups, weights=values, minlength=len(counts)) / np.maximum(counts, 1)
+    mean_sq = np.bincount(groups, weights=values * values, minlength=len(counts)) / np.maximum(counts, 1)
+    return mean, np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+
+def detect_recurring(columns):
+    """
+    Finds (user, merchant) groups charged at a steady known period.
+    Returns a list of dicts, one per recurring charge, and a boolean mask of
+    the rows that belong to one.
+    """
+    if len(columns["ids"]) == 0:
+        return [], np.zeros(0, dtype=bool)
+    _, user_codes = np.unique(columns["users"], return_inverse=True)
+    merchants = np.array([normalize_merchant(name) for name in columns["names"]], dtype=object)
+    _, merchant_codes = np.unique(merchants, return_inverse=True)
+
+    order = np.lexsort((columns["days"], merchant_codes, user_codes))
+    keys = user_codes[order].astype(np.int64) * (merchant_codes.max() + 1) + merchant_codes[order]
+    days = columns["days"][order]
+    amounts = columns["amounts"][order]
+    groups, starts, counts = _group_bounds(keys)
+
+    # Gaps between consecutive charges of the same group
+    same_group = groups[1:] == groups[:-1]
+    gap_groups = groups[1:][same_group]
+    gaps = np.diff(days).astype(np.float64)[same_group]
+    gap_counts = np.bincount(gap_groups, minlength=len(starts))
+    gap_mean, gap_std = _mean_std(gap_groups, gaps, gap_counts)
+    amount_mean, amount_std = _mean_std(groups, amounts, counts)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distance = np.abs(gap_mean[:, None] - PERIODS) / PERIODS
+        gap_cv = gap_std / gap_mean
+        amount_cv = amount_std / np.abs(amount_mean)
+    nearest = distance.argmin(axis=1)
+    recurring = (
+        (counts >= MIN_OCCURRENCES)
+        & (gap_mean > 0)
+        & (distance[np.arange(len(starts)), nearest] <= PERIOD_TOLERANCE)
+        & (gap_cv <= MAX_INTERVAL_CV)
+        & (amount_cv <= MAX_AMOUNT_CV)
+    )
+
+    in_recurring = np.empty(len(order), dtype=bool)
+    in_recurring[order] = recurring[groups]
+
+    last_rows = starts + counts - 1
+    results = []
+    for g in np.flatnonzero(recurring):
+        last = last_rows[g]
+        results.append({
+            "user_id": columns["users"][order[last]],
+            "name": columns["names"][order[last]],
+            "period_days": float(gap_mean[g]),
+            "period_label": PERIOD_LABELS[nearest[g]],
+            "typical_amount": round(float(amount_mean[g]), 2),
+            "occurrences": int(counts[g]),
+            "last_day": int(days[last]),
+            "next_expected_day": int(days[last] + round(gap_mean[g])),
+        })
+    return results, in_recurring
+
+
+def detect_anomalies(columns, exclude=None):
+    """
+    Flags spendings whose amount is far from the user's usual amounts, by
+    z-score or by distance outside the interquartile range. Rows masked by
+    exclude (e.g. recurring charges) are left out of both stats and results.
+    Returns a list of dicts, one per flagged spending.
+    """
+    if exclude is not None:
+        columns = {name: values[~exclude] for name, values in columns.items()}
+    if len(columns["ids"]) == 0:
+        return []
+    _, user_codes = np.unique(columns["users"], return_inverse=True)
+    order = np.lexsort((columns["amounts"], user_codes))
+    amounts = columns["amounts"][order]
+    groups, starts, counts = _group_bounds(user_codes[order])
+
+    mean, std = _mean_std(groups, amounts, counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std[groups] > 0, (amounts - mean[groups]) / std[groups], 0.0)
+
+    def quantile(q):
+        # Linear interpolation inside each user's sorted run of amounts
+        position = starts + q * (counts - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, starts + counts - 1)
+        return amounts[low] + (position - low) * (amounts[high] - amounts[low])
+
+    q1, q3 = quantile(0.25), quantile(0.75)
+    fence = IQR_FACTOR * (q3 - q1)
+    by_z = np.abs(z) > Z_THRESHOLD
+    by_iqr = (fence[groups] > 0) & ((amounts > q3[groups] + fence[groups]) | (amounts < q1[groups] - fence[groups]))
+    flagged = (counts[groups] >= MIN_ANOMALY_HISTORY) & (by_z | by_iqr)
+
+    results = []
+    for row in np.flatnonzero(flagged):
+        if by_z[row] and by_iqr[row]:
+            reason = "z-score and IQR outlier"
+        elif by_z[row]:
+            reason = "z-score outlier"
+        else:
+            reason = "IQR outlier"
+        results.append({
+            "user_id": columns["users"][order[row]],
+            "spending_id": int(columns["ids"][order[row]]),
+            "z_score": float(z[row]),
+            "reason": reason,
+        })
+    return results
@@ -0,0 +1,30 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+
+from django.core.management.base import CommandError
+
+
+def peak_rss_mb():
+    """Peak resident memory of the current process, in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_cold_worker(script, *args, label="worker"):
+    """
+    Runs a Python script in a fresh interpreter, so its timings and peak RSS
+    start from a cold process, and returns the JSON object on the last line
+    of its output. LLM warm-up is turned off so only the script loads models.
+    """
+    env = {**os.environ, "LLM_WARMUP": "false"}
+    proc = subprocess.run(
+        [sys.executable, "-c", script, *map(str, args)],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        raise CommandError(f"{label} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
@@ -0,0 +1,11 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def cache_is_shared(alias="default"):
+    """
+    False for cache backends that live in each process' memory, where a
+    delete in one worker is invisible to the others.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
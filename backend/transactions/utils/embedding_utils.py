@@ -0,0 +1,304 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .analytics_utils import normalize_merchant
+from .gpt_utils import MODEL_PATH
+
+logger = logging.getLogger(__name__)
+
+# Small sentence-embedding model shipped for gpt4all's Embed4All; runs on CPU
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2.gguf2.f16.gguf"
+EMBED_BATCH_SIZE = 256
+
+TOP_K = 20       # most similar merchant keys a search can match
+MIN_SCORE = 0.5  # cosine similarity below which a key never matches
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """
+    Returns this process' shared Embed4All model, loading it on first use.
+    Raises ImportError if gpt4all is not installed.
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from gpt4all import Embed4All
+
+                _embedder = Embed4All(
+                    EMBEDDING_MODEL_NAME, model_path=MODEL_PATH, allow_download=False, device="cpu"
+                )
+    return _embedder
+
+
+def unit_rows(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def embed_texts(texts):
+    """Embeds texts with the local model, as one float32 unit vector per row."""
+    return unit_rows(np.asarray(get_embedder().embed(list(texts)), dtype=np.float32))
+
+
+def index_key(name):
+    """
+    The text embedded for a spending name. Store numbers and symbols are
+    dropped so "SBUX #1234" and "SBUX #987" share one vector.
+    """
+    return normalize_merchant(name) or " ".join(name.lower().split())
+
+
+class SpendingIndex:
+    """
+    A user's spending names as embeddings, in flat files under
+    SPENDING_INDEX_DIR: one unit vector per distinct merchant key, plus a
+    (spending id, key row) pair per spending. Files are only appended to, or
+    patched in place, and are read memory-mapped.
+    """
+
+    def __init__(self, user_id, embed=embed_texts, model_name=EMBEDDING_MODEL_NAME, root=None):
+        # User ids are arbitrary strings, so hash them into a safe directory name
+        digest = hashlib.sha256(str(user_id).encode()).hexdigest()[:32]
+        self.dir = os.path.join(root or settings.SPENDING_INDEX_DIR, digest)
+        self.embed = embed
+        self.model_name = model_name
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def _meta(self):
+        try:
+            with open(self._path("meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _keys(self):
+        try:
+            with open(self._path("keys.txt"), encoding="utf-8") as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def _array(self, name, dtype, width=None, mode="r"):
+        """Memory-maps one of the index files; only whole rows are visible."""
+        path = self._path(name)
+        row_bytes = np.dtype(dtype).itemsize * (width or 1)
+        count = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+        shape = (count, width) if width else (count,)
+        if count == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    def _truncate(self, name, size):
+        path = self._path(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    def _append(self, name, data):
+        with open(self._path(name), "ab") as f:
+            f.write(data)
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self._path(".lock"), "w") as lock:
+            # Writers from other processes would interleave appends
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def indexed_ids(self):
+        ids = self._array("ids.i64", np.int64)
+        rows = self._array("rows.i32", np.int32)
+        n = min(len(ids), len(rows))
+        return np.asarray(ids[:n][rows[:n] >= 0])
+
+    def add(self, rows, replace=False):
+        """
+        Indexes (spending id, name) pairs, embedding only keys not seen before,
+        EMBED_BATCH_SIZE at a time. With replace, earlier entries for the same
+        ids are dropped (renamed spendings). Returns the number of new keys.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self._write_lock():
+            meta = self._meta()
+            if meta and meta["model"] != self.model_name:
+                raise ValueError(
+                    f"{self.dir} was built with {meta['model']}; rebuild it with build_spending_index --rebuild."
+                )
+            keys = self._keys()
+            # Drop anything an interrupted writer left past the last complete entry
+            if meta:
+                self._truncate("vectors.f32", len(keys) * meta["dim"] * 4)
+            entries = min(len(self._array("ids.i64", np.int64)), len(self._array("rows.i32", np.int32)))
+            self._truncate("ids.i64", entries * 8)
+            self._truncate("rows.i32", entries * 4)
+
+            positions = {key: i for i, key in enumerate(keys)}
+            row_keys = [index_key(name) for _, name in rows]
+            new_keys = list(dict.fromkeys(key for key in row_keys if key not in positions))
+            if new_keys:
+                vectors = np.concatenate([
+                    self.embed(new_keys[i:i + EMBED_BATCH_SIZE])
+                    for i in range(0, len(new_keys), EMBED_BATCH_SIZE)
+                ]).astype(np.float32)
+                if meta is None:
+                    with open(self._path("meta.json"), "w") as f:
+                        json.dump({"model": self.model_name, "dim": vectors.shape[1]}, f)
+                self._append("vectors.f32", vectors.tobytes())
+                # Written after the vectors, so every listed key has one
+                with open(self._path("keys.txt"), "a", encoding="utf-8") as f:
+                    f.write("".join(key + "\n" for key in new_keys))
+                for key in new_keys:
+                    positions[key] = len(positions)
+
+            ids = np.array([spending_id for spending_id, _ in rows], dtype=np.int64)
+            if replace and entries:
+                old_ids = self._array("ids.i64", np.int64)
+                old_rows = self._array("rows.i32", np.int32, mode="r+")
+                old_rows[np.isin(old_ids, ids)] = -1
+                old_rows.flush()
+            self._append("ids.i64", ids.tobytes())
+            self._append("rows.i32", np.array([positions[key] for key in row_keys], dtype=np.int32).tobytes())
+        return len(new_keys)
+
+    def remove(self, ids):
+        """Drops the entries of deleted spendings; their merchant keys stay."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids) or self._meta() is None:
+            return
+        with self._write_lock():
+            old_ids = self._array("ids.i64", np.int64)
+            old_rows = self._array("rows.i32", np.int32, mode="r+")
+            n = min(len(old_ids), len(old_rows))
+            if n:
+                old_rows[:n][np.isin(old_ids[:n], ids)] = -1
+                old_rows.flush()
+
+    def search(self, text, k=TOP_K, min_score=MIN_SCORE):
+        """Returns ids of the spendings whose merchant key is among the k most similar to text."""
+        meta = self._meta()
+        if meta is None or meta["model"] != self.model_name:
+            return np.zeros(0, dtype=np.int64)
+        # Entries before vectors: a writer appends vectors first, so every row read
+        # here points at a key that is already there when the vectors are read
+        ids = self._array("ids.i64", np.int64)
+        rows = self._array("rows.i32", np.int32)
+        n = min(len(ids), len(rows))
+        ids, rows = ids[:n], rows[:n]
+        keys = self._array("vectors.f32", np.float32, width=meta["dim"])
+        if len(keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        scores = keys @ self.embed([text])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[scores[top] >= min_score]
+
+        # One extra, never-matching slot for dropped entries (key row -1)
+        matched = np.zeros(len(keys) + 1, dtype=bool)
+        matched[top] = True
+        return np.asarray(ids[matched[rows]])
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def search_spending_ids(user_id, text):
+    """
+    Ids of the user's spendings whose names mean something close to text.
+    Empty when SPENDING_EMBEDDINGS is off or the index cannot be used.
+    """
+    if not settings.SPENDING_EMBEDDINGS:
+        return []
+    try:
+        return SpendingIndex(user_id).search(text).tolist()
+    except ImportError:
+        return []
+    except Exception:
+        logger.exception("Semantic spending search failed; falling back to substring matching.")
+        return []
+
+
+_pending = threading.local()
+# One background thread embeds and writes, so saves never wait for the model
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spending-index")
+
+
+def queue_for_index(spending, created):
+    """
+    Indexes a saved spending's name once its transaction commits, in one
+    batch with every other spending saved in that transaction. The embedding
+    itself runs on a background thread.
+    """
+    _queue(spending, spending.name, created)
+
+
+def queue_for_removal(spending):
+    """Drops a deleted spending from the index once its transaction commits."""
+    _queue(spending, None, False)
+
+
+def _queue(spending, name, created):
+    """Adds to this thread's batch; a None name marks a deleted spending."""
+    if not settings.SPENDING_EMBEDDINGS:
+        return
+    connection = transaction.get_connection()
+    batch = getattr(_pending, "batch", None)
+    flush = getattr(_pending, "flush", None)
+    # A rolled-back transaction drops its on_commit callback but not our batch
+    if batch is None or not connection.in_atomic_block or not any(
+        callback is flush for _, callback, _ in connection.run_on_commit
+    ):
+        batch = {}
+        flush = partial(_submit_batch, batch)
+        _pending.batch, _pending.flush = batch, flush
+        register = True
+    else:
+        register = False
+    # A spending created then edited in the same transaction is indexed once
+    batch[spending.pk] = (spending.user_id, name, created and spending.pk not in batch)
+    if register:
+        # Runs right away outside a transaction
+        transaction.on_commit(flush)
+
+
+def _submit_batch(batch):
+    if getattr(_pending, "batch", None) is batch:
+        _pending.batch = _pending.flush = None
+    _executor.submit(_index_batch, batch)
+
+
+def _index_batch(batch):
+    by_user = {}
+    for spending_id, (user_id, name, created) in batch.items():
+        created_rows, updated_rows, deleted_ids = by_user.setdefault(user_id, ([], [], []))
+        if name is None:
+            deleted_ids.append(spending_id)
+        else:
+            (created_rows if created else updated_rows).append((spending_id, name))
+    for user_id, (created_rows, updated_rows, deleted_ids) in by_user.items():
+        try:
+            index = SpendingIndex(user_id)
+            index.add(created_rows)
+            index.add(updated_rows, replace=True)
+            index.remove(deleted_ids)
+        except Exception:
+            logger.exception("Could not index spendings of user %s; build_spending_index will catch up.", user_id)
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import zlib
+
+# Columns written for every exported spending, in order
+EXPORT_FIELDS = ["id", "date", "name", "description", "amount", "category", "parent_category"]
+EXPORT_VALUES = ["id", "date", "name", "description", "amount", "category__name", "category__parent__name"]
+
+# Rows fetched per server-side cursor round trip, and rows per yielded chunk
+CHUNK_SIZE = 2000
+
+
+def export_rows(queryset):
+    """
+    Streams (id, date, name, ...) tuples with the category names joined in,
+    through a server-side cursor so memory stays flat for any history size.
+    """
+    return queryset.order_by("date", "id").values_list(*EXPORT_VALUES).iterator(chunk_size=CHUNK_SIZE)
+
+
+def csv_chunks(rows):
+    """Yields the CSV header right away, then CHUNK_SIZE rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def jsonl_chunks(rows):
+    """Yields one JSON object per line, CHUNK_SIZE lines per chunk."""
+    lines = []
+    for row in rows:
+        # Decimal amounts and dates become strings, like the rest of the API
+        lines.append(json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str))
+        if len(lines) == CHUNK_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an Accept-Encoding header allows gzip, honouring q-values so
+    "gzip;q=0" counts as a refusal.
+    """
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        return quality > 0
+    return False
+
+
+def gzip_chunks(chunks):
+    """
+    Compresses text chunks into a single gzip stream as they are produced.
+    Each chunk is sync-flushed, so the client gets it right away instead of
+    once zlib's buffer fills up.
+    """
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
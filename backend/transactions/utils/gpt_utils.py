@@ -1,12 +1,17 @@
 import os
+import logging
+import threading
+import time
 from pathlib import Path
 import json
-from gpt4all import GPT4All
+from datetime import date
 
 # Path to your GPT4All Mistral model
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 MODEL_PATH = os.path.join(BASE_DIR, "models")
 
+logger = logging.getLogger(__name__)
+
 # A system prompt that instructs GPT on how to respond in structured JSON
 SYSTEM_PROMPT = """
 You are a helpful finance assistant. You will receive questions about a user's spendings.
@@ -36,25 +41,234 @@ If you cannot parse the question, return:
 }
 """
 
+# Prompt for turning a batch of OCR'd receipts into structured data
+RECEIPT_SYSTEM_PROMPT = """
+You extract purchases from receipt text. You will receive several numbered receipts.
+You must ALWAYS respond with a single valid JSON array holding one object per receipt, in the same order:
+
+[
+  {
+    "merchant": "<store name or null>",
+    "date": "<YYYY-MM-DD or null>",
+    "total": <amount paid as a number, or null>,
+    "items": [{"name": "<item>", "amount": <number>}]
+  }
+]
+
+Use null for anything you cannot find. Do not add any text outside the JSON array.
+"""
+
+# mistral-7b-instruct-v0.1.Q4_0.gguf
+# Llama-3.2-3B-Instruct-Q4_0.gguf
+MODEL_NAME = "mistral-7b-instruct-v0.1.Q4_0.gguf"
+
+# Context window the model is loaded with; gpt4all's own default
+N_CTX = 2048
+
+# Receipt text beyond this many characters rarely holds the merchant, date or total
+RECEIPT_TEXT_LIMIT = 1500
+# Tokens the model may write per receipt in a batch
+RECEIPT_OUTPUT_TOKENS = 150
+# Receipts are mostly digits, prices and abbreviations, which split into short tokens
+RECEIPT_CHARS_PER_TOKEN = 2
+
+
+def _receipt_block(number, text):
+    return f"Receipt {number}:\n{text[:RECEIPT_TEXT_LIMIT]}\n\n"
+
+
+def receipt_batches(texts, max_size):
+    """
+    Splits receipt texts into batches for extract_receipts(): at most
+    max_size each, and small enough that the prompt plus the answer fit the
+    model's N_CTX token window. Yields lists of positions in texts.
+    """
+    budget = N_CTX - (len(RECEIPT_SYSTEM_PROMPT) + 16) // RECEIPT_CHARS_PER_TOKEN
+    batch, used = [], 0
+    for position, text in enumerate(texts):
+        cost = len(_receipt_block(len(batch) + 1, text)) // RECEIPT_CHARS_PER_TOKEN + RECEIPT_OUTPUT_TOKENS
+        if batch and (len(batch) == max_size or used + cost > budget):
+            yield batch
+            batch, used = [], 0
+        batch.append(position)
+        used += cost
+    if batch:
+        yield batch
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def get_gpt_handler():
+    """
+    Returns this process' shared GPTQueryHandler, loading the model on first use.
+    Raises ImportError if gpt4all is not installed.
+    """
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                _handler = GPTQueryHandler()
+    return _handler
+
+
+def warm_up_gpt_handler():
+    """
+    Loads the model and processes the system prompt ahead of the first query.
+    Failures are logged, not raised.
+    """
+    try:
+        get_gpt_handler().warm_up()
+    except Exception:
+        logger.exception("GPT4All warm-up failed; queries will retry loading the model.")
+
+
+# Sampling settings, identical to GPT4All.generate()'s defaults
+GENERATION_KWARGS = dict(
+    temp=0.7,
+    top_k=40,
+    top_p=0.4,
+    min_p=0.0,
+    repeat_penalty=1.18,
+    repeat_last_n=64,
+    n_batch=8,
+)
+
+
 class GPTQueryHandler:
-    def __init__(self, model_path=MODEL_PATH):
-        # mistral-7b-instruct-v0.1.Q4_0.gguf
-        # Llama-3.2-3B-Instruct-Q4_0.gguf
-        self.gpt = GPT4All(model_name="mistral-7b-instruct-v0.1.Q4_0.gguf", model_path=model_path, allow_download=False)
-
-    def parse_query(self, user_prompt: str) -> dict:
-        """Generate a structured JSON response from the GPT model."""
-        # Combine system prompt + user's query
-        full_prompt = SYSTEM_PROMPT + "\nUser: " + user_prompt + "\nAssistant: "
-
-        # Instruct GPT4All to produce up to 200 tokens
-        output = self.gpt.generate(
-            prompt=full_prompt,
-            max_tokens=200
+    def __init__(self, model_path=MODEL_PATH, model_name=MODEL_NAME):
+        # Imported here so processes that never answer queries skip the native library
+        from gpt4all import GPT4All
+
+        self.gpt = GPT4All(model_name=model_name, model_path=model_path, allow_download=False, n_ctx=N_CTX)
+        # The model instance is shared by every request thread in the process
+        self._lock = threading.Lock()
+        self._prefix_n_past = None
+        # Rewinding the context relies on LLModel internals (gpt4all 2.8.2, see environment.yml)
+        self._prefix_reuse = callable(getattr(self.gpt.model, "prompt_model", None))
+        self.system_prompt_time = None
+        self.last_timings = {}
+
+    def _ingest_system_prompt(self):
+        """
+        Evaluates SYSTEM_PROMPT once and remembers how many tokens it took, so
+        every query can rewind the model's context to right after it.
+        """
+        start = time.perf_counter()
+        self.gpt.model.prompt_model(
+            SYSTEM_PROMPT, "%1", lambda token_id, response: True,
+            n_predict=0, reset_context=True, **GENERATION_KWARGS
         )
+        self._prefix_n_past = self.gpt.model.context.n_past
+        self.system_prompt_time = time.perf_counter() - start
+
+    def warm_up(self):
+        with self._lock:
+            if self._prefix_reuse and self._prefix_n_past is None:
+                try:
+                    self._ingest_system_prompt()
+                except (AttributeError, TypeError):
+                    self._disable_prefix_reuse()
+
+    def _disable_prefix_reuse(self):
+        logger.warning(
+            "This gpt4all version does not match the LLModel internals gpt_utils relies on; "
+            "every query now processes the system prompt again.", exc_info=True
+        )
+        self._prefix_reuse = False
+        self._prefix_n_past = None
+
+    def _generate(self, user_prompt: str, max_tokens: int) -> str:
+        """Runs the user's part of the prompt on top of the cached system prompt."""
+        prompt = "\nUser: " + user_prompt + "\nAssistant: "
+        pieces = []
+        first_token_at = None
+
+        def collect(token_id, response):
+            nonlocal first_token_at
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            pieces.append(response)
+            return True
+
+        start = time.perf_counter()
+        if not self._rewind_and_prompt(prompt, max_tokens, collect):
+            pieces.clear()
+            self.gpt.generate(SYSTEM_PROMPT + prompt, max_tokens=max_tokens, callback=collect, **GENERATION_KWARGS)
+            # generate() starts from an empty context, so the cached prefix is gone
+            self._prefix_n_past = None
+        end = time.perf_counter()
+        first_token_at = first_token_at or end
+
+        self.last_timings = {
+            "prompt_processing_s": first_token_at - start,
+            "generation_s": end - first_token_at,
+            "generated_tokens": len(pieces),
+        }
+        logger.debug("GPT4All query timings: %s", self.last_timings)
+        return "".join(pieces)
+
+    def _rewind_and_prompt(self, prompt, max_tokens, callback):
+        """
+        Prompts the model right after the cached system prompt. Returns False,
+        without prompting, when that is not possible.
+        """
+        if not self._prefix_reuse:
+            return False
+        try:
+            if self._prefix_n_past is None:
+                self._ingest_system_prompt()
+            # No token is shorter than a byte, so this bounds the prompt's length. A query
+            # that could reach N_CTX would make the backend erase the start of the context,
+            # system prompt included, and leave the cached prefix pointing at other tokens.
+            if self._prefix_n_past + len(prompt.encode()) + max_tokens >= N_CTX:
+                return False
+            # Everything past the system prompt is overwritten by this query
+            self.gpt.model.context.n_past = self._prefix_n_past
+            self.gpt.model.prompt_model(
+                prompt, "%1", callback, n_predict=max_tokens, reset_context=False, **GENERATION_KWARGS
+            )
+        except (AttributeError, TypeError):
+            self._disable_prefix_reuse()
+            return False
+        return True
+
+    def extract_receipts(self, texts: list) -> list:
+        """
+        Extracts merchant, date, total and items from several receipts in one
+        generation; receipt_batches() sizes batches to fit the context. Returns
+        one dict per receipt, or None entries if the model did not return a
+        usable JSON array.
+        """
+        receipts = "".join(_receipt_block(i, text) for i, text in enumerate(texts, 1))
+        prompt = RECEIPT_SYSTEM_PROMPT + "\n" + receipts + "JSON: "
+        with self._lock:
+            output = self.gpt.generate(prompt=prompt, max_tokens=RECEIPT_OUTPUT_TOKENS * len(texts))
+            # generate() starts from an empty context, so the cached query prefix is gone
+            self._prefix_n_past = None
+        try:
+            data = json.loads(output)
+        except json.JSONDecodeError:
+            data = None
+        if not isinstance(data, list) or len(data) != len(texts):
+            logger.warning("Unusable model output for a batch of %d receipts: %.200r", len(texts), output)
+            return [None] * len(texts)
+        return [item if isinstance(item, dict) else None for item in data]
+
+    def parse_query(self, user_prompt: str, today: date = None) -> dict:
+        """
+        Generate a structured JSON response from the GPT model. Relative dates
+        ("this month") are resolved against `today`, the current date by default.
+        """
+        today = today or date.today()
+        # Sent with the question rather than the system prompt, which stays cached across days
+        prompt = f"(Today is {today:%A}, {today.isoformat()}.) {user_prompt}"
+        # Instruct GPT4All to produce up to 200 tokens, reusing the processed system prompt
+        with self._lock:
+            output = self._generate(prompt, max_tokens=200)
         # output is plain text— try to parse as JSON
         try:
             data = json.loads(output)
         except json.JSONDecodeError:
             data = {"error": "Model did not return valid JSON."}
-        return data
\ No newline at end of file
+        return data
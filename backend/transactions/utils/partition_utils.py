@@ -0,0 +1,163 @@
+"""
+Helpers for optional Postgres range partitioning of the Spending table by date.
+
+The partitioned table keeps the same name and columns, so the ORM is unaware of
+it. Postgres requires the partition key in every unique index, so its primary
+key becomes (id, date); ids still come from the same identity sequence.
+"""
+from datetime import date
+
+from django.db import transaction
+
+# Spending._meta.db_table, spelled out so migrations can use this module
+TABLE = "transactions_spending"
+INTERVALS = ("month", "year")
+
+
+def period_start(day, interval):
+    if interval == "month":
+        return date(day.year, day.month, 1)
+    return date(day.year, 1, 1)
+
+
+def next_period(start, interval):
+    if interval == "month":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return date(start.year + 1, 1, 1)
+
+
+def partition_name(start, interval):
+    if interval == "month":
+        return f"{TABLE}_p{start:%Y_%m}"
+    return f"{TABLE}_p{start:%Y}"
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+        [TABLE],
+    )
+    return cursor.fetchone() is not None
+
+
+def list_partitions(cursor):
+    """Returns (name, from_date, to_date) per range partition, oldest first, skipping the default one."""
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+        [TABLE],
+    )
+    partitions = []
+    for name, bound in cursor.fetchall():
+        # e.g. FOR VALUES FROM ('2025-01-01') TO ('2025-02-01')
+        if bound == "DEFAULT":
+            continue
+        low, high = bound.split("'")[1], bound.split("'")[3]
+        partitions.append((name, date.fromisoformat(low), date.fromisoformat(high)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def _table_ddl(cursor, table):
+    """Returns the CREATE INDEX statements (minus the primary key) and FK clauses of a table."""
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+        [table, f"{table}_pkey"],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+    return indexes, foreign_keys
+
+
+def _rebuild_table(cursor, partition_by, primary_key):
+    """
+    Swaps TABLE for an empty copy (partitioned or not) and moves every row
+    over, keeping index and constraint names so later migrations still find them.
+    """
+    indexes, foreign_keys = _table_ddl(cursor, TABLE)
+    old = f"{TABLE}_old"
+    cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{old}"')
+    cursor.execute(f'ALTER TABLE "{old}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{old}_pkey"')
+    cursor.execute(
+        f'CREATE TABLE "{TABLE}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING IDENTITY) {partition_by}'
+    )
+    cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY ({primary_key})')
+    return old, indexes, foreign_keys
+
+
+def _finish_rebuild(cursor, old, indexes, foreign_keys):
+    cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{old}"')
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) FROM \"{TABLE}\"",
+        [TABLE],
+    )
+    cursor.execute(f'DROP TABLE "{old}"')
+    for indexdef in indexes:
+        cursor.execute(indexdef)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+    cursor.execute(f'ANALYZE "{TABLE}"')
+
+
+def partition_table(cursor, interval, ahead=3):
+    """
+    Converts the plain Spending table into one range-partitioned by date, with a
+    partition per interval from the oldest row up to `ahead` intervals from now,
+    plus a default partition for anything outside them.
+    """
+    old, indexes, foreign_keys = _rebuild_table(cursor, 'PARTITION BY RANGE ("date")', '"id", "date"')
+    cursor.execute(f'SELECT MIN("date") FROM "{old}"')
+    oldest = cursor.fetchone()[0] or date.today()
+    cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+    create_partitions(cursor, interval, oldest, ahead)
+    _finish_rebuild(cursor, old, indexes, foreign_keys)
+
+
+def unpartition_table(cursor):
+    """Turns the partitioned Spending table back into a plain one, dropping its partitions."""
+    old, indexes, foreign_keys = _rebuild_table(cursor, "", '"id"')
+    _finish_rebuild(cursor, old, indexes, foreign_keys)
+
+
+def create_partition(cursor, start, interval):
+    """
+    Creates the partition for the interval starting at `start`, moving any rows
+    the default partition already holds for that range. Returns False if it exists.
+    """
+    name = partition_name(start, interval)
+    end = next_period(start, interval)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+    with transaction.atomic():
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{TABLE}_default" WHERE "date" >= %s AND "date" < %s RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [start, end],
+        )
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+    return True
+
+
+def create_partitions(cursor, interval, oldest, ahead):
+    """Creates every missing partition from `oldest` up to `ahead` intervals past today."""
+    last = period_start(date.today(), interval)
+    for _ in range(ahead):
+        last = next_period(last, interval)
+    created = []
+    start = period_start(oldest, interval)
+    while start <= last:
+        if create_partition(cursor, start, interval):
+            created.append(partition_name(start, interval))
+        start = next_period(start, interval)
+    return created
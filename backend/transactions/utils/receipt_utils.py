@@ -0,0 +1,132 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+_AMOUNT = r"-?\$?\s?\d{1,6}(?:,\d{3})*\.\d{2}"
+AMOUNT_AT_END = re.compile(rf"({_AMOUNT})\s*[A-Z]?\s*$")
+
+DATE_PATTERNS = [
+    # 2025-01-31
+    (re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b"), ("year", "month", "day")),
+    # 01/31/2025 or 01/31/25 (North American month first)
+    (re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})\b"), ("month", "day", "year")),
+    # Jan 31, 2025
+    (re.compile(r"\b([A-Za-z]{3})[a-z]*\.?\s+(\d{1,2}),?\s+(\d{4})\b"), ("month_name", "day", "year")),
+    # 31 Jan 2025
+    (re.compile(r"\b(\d{1,2})\s+([A-Za-z]{3})[a-z]*\.?,?\s+(\d{4})\b"), ("day", "month_name", "year")),
+]
+MONTHS = {name: i for i, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1
+)}
+
+TOTAL_LINE = re.compile(r"\b(grand total|total due|amount due|balance due|total)\b", re.IGNORECASE)
+SUBTOTAL_LINE = re.compile(r"\bsub\s?-?total\b", re.IGNORECASE)
+# Lines with an amount that are not purchased items
+NON_ITEM_LINE = re.compile(
+    r"\b(total|sub\s?-?total|tax|gst|pst|hst|vat|change|cash|visa|mastercard|amex|debit|credit|tip|gratuity|"
+    r"balance|amount|tender|savings|discount|points)\b",
+    re.IGNORECASE,
+)
+# Header lines that are not the merchant's name
+NON_MERCHANT_LINE = re.compile(r"\b(receipt|welcome|invoice|tel|phone|www\.|http|order|cashier|store #)\b", re.IGNORECASE)
+
+
+def parse_amount(text):
+    try:
+        return Decimal(re.sub(r"[$,\s]", "", text)).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def find_date(text):
+    for pattern, parts in DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            values = dict(zip(parts, match.groups()))
+            try:
+                month = MONTHS.get(values["month_name"][:3].lower()) if "month_name" in values else int(values["month"])
+                year = int(values["year"])
+                if year < 100:
+                    year += 2000
+                return date(year, month, int(values["day"]))
+            except (TypeError, ValueError):
+                continue  # e.g. a phone number or an impossible date
+    return None
+
+
+def find_merchant(lines):
+    for line in lines[:5]:
+        letters = sum(c.isalpha() for c in line)
+        if letters >= 3 and letters >= len(line.replace(" ", "")) / 2 and not NON_MERCHANT_LINE.search(line):
+            return line.strip()[:100]
+    return None
+
+
+def extract_heuristic(text):
+    """
+    Pulls merchant, date, total and line items out of OCR'd receipt text with
+    regexes. 'ambiguous' is set when the merchant, date or total is missing,
+    or the items add up to more than the total.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    total = None
+    items = []
+    for line in lines:
+        match = AMOUNT_AT_END.search(line)
+        if not match:
+            continue
+        amount = parse_amount(match.group(1))
+        if TOTAL_LINE.search(line) and not SUBTOTAL_LINE.search(line):
+            # The last total on a receipt is the one actually paid
+            total = amount
+        elif not NON_ITEM_LINE.search(line):
+            name = line[:match.start()].strip(" .:-\t")
+            if any(c.isalpha() for c in name):
+                items.append({"name": name[:100], "amount": amount})
+
+    result = {
+        "merchant": find_merchant(lines),
+        "date": find_date(text),
+        "total": total,
+        "items": items,
+    }
+    items_sum = sum((item["amount"] for item in items), Decimal("0"))
+    result["ambiguous"] = (
+        result["merchant"] is None or result["date"] is None or total is None
+        or (total is not None and items_sum > total)
+    )
+    return result
+
+
+def merge_model_result(result, model_result):
+    """Fills fields the heuristics missed from the model's answer, validating its types."""
+    if not model_result:
+        return result
+    merged = dict(result)
+    if not merged["merchant"] and isinstance(model_result.get("merchant"), str):
+        merged["merchant"] = model_result["merchant"].strip()[:100] or None
+    if not merged["date"] and isinstance(model_result.get("date"), str):
+        try:
+            merged["date"] = datetime.strptime(model_result["date"], "%Y-%m-%d").date()
+        except ValueError:
+            pass
+    items_sum = sum((item["amount"] for item in merged["items"]), Decimal("0"))
+    if isinstance(model_result.get("total"), (int, float, str)) and (
+        merged["total"] is None or items_sum > merged["total"]
+    ):
+        total = parse_amount(str(model_result["total"]))
+        if total is not None:
+            merged["total"] = total
+    if not merged["items"] and isinstance(model_result.get("items"), list):
+        merged["items"] = [
+            {"name": str(item["name"])[:100], "amount": parse_amount(str(item["amount"]))}
+            for item in model_result["items"]
+            if isinstance(item, dict) and "name" in item and "amount" in item
+            and parse_amount(str(item["amount"])) is not None
+        ]
+    return merged
+
+
+def describe_items(items, limit=100):
+    """Short 'Milk, Bread, Eggs' summary of the line items that fits Spending.description."""
+    description = ", ".join(item["name"] for item in items)
+    return description if len(description) <= limit else description[:limit - 3] + "..."
@@ -0,0 +1,117 @@
+import fcntl
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from ..models import Receipt, ReceiptUpload
+
+# Bytes read from the request or disk at a time
+BLOCK_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """A chunk that cannot be appended; the upload is left at its previous offset."""
+
+
+class OffsetConflict(ChunkError):
+    """The chunk was sent for an offset the upload is no longer at."""
+
+
+def part_path(upload):
+    return os.path.join(settings.RECEIPT_UPLOAD_DIR, f"{upload.id}.part")
+
+
+def append_chunk(upload, stream, offset, sha256=None):
+    """
+    Streams a chunk from `stream` onto the upload's partial file at `offset`,
+    hashing it on the way, then advances upload.offset. Returns the number of
+    bytes written. A lock on the partial file, not a database transaction,
+    keeps concurrent writers out while a slow client sends the chunk. On an
+    offset, size or checksum problem the file is truncated back and ChunkError
+    is raised. Raises ReceiptUpload.DoesNotExist if the upload went away.
+    """
+    path = part_path(upload)
+    os.makedirs(settings.RECEIPT_UPLOAD_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    written = 0
+
+    with open(path, "ab") as part:
+        fcntl.flock(part, fcntl.LOCK_EX)
+        try:
+            upload.refresh_from_db(fields=["offset"])
+        except ReceiptUpload.DoesNotExist:
+            # Finalized or discarded while this request waited for the lock
+            os.remove(path)
+            raise
+        if offset != upload.offset:
+            raise OffsetConflict("Offset mismatch.")
+        limit = min(settings.RECEIPT_UPLOAD_MAX_CHUNK_SIZE, upload.size - upload.offset)
+        # Drop bytes past the recorded offset left behind by an interrupted request
+        part.truncate(upload.offset)
+        try:
+            while stream is not None:
+                block = stream.read(BLOCK_SIZE)
+                if not block:
+                    break
+                written += len(block)
+                if written > limit:
+                    raise ChunkError(f"Chunk exceeds the {limit} bytes still allowed.")
+                digest.update(block)
+                part.write(block)
+            if sha256 and digest.hexdigest() != sha256.lower():
+                raise ChunkError("Chunk checksum mismatch.")
+            part.flush()
+            # Conditional, so an upload finalized or expired meanwhile is not touched
+            if not ReceiptUpload.objects.filter(id=upload.id, offset=offset).update(
+                offset=offset + written, updated_at=timezone.now()
+            ):
+                raise ChunkError("Upload changed while the chunk was sent.")
+        except Exception:
+            part.truncate(offset)
+            raise
+    upload.offset = offset + written
+    return written
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_image(path):
+    """Checks the file header only, so large photos are not decoded."""
+    try:
+        with Image.open(path):
+            return True
+    except (UnidentifiedImageError, OSError):
+        return False
+
+
+def move_to_storage(upload):
+    """
+    Moves the finished partial file into media storage without copying it and
+    returns its storage name, ready to assign to Receipt.image.
+    """
+    # The same naming Receipt.image applies to files saved through it
+    name = Receipt._meta.get_field("image").generate_filename(None, os.path.basename(upload.filename))
+    name = default_storage.get_available_name(name)
+    destination = default_storage.path(name)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    os.replace(part_path(upload), destination)
+    return name
+
+
+def discard(upload):
+    """Deletes an upload and its partial file."""
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
@@ -2,11 +2,17 @@ from rest_framework import viewsets
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Sum, Q
+from django.http import StreamingHttpResponse
 from datetime import datetime
-from .models import Spending, Category, Receipt
-from .serializers import SpendingSerializer, CategorySerializer, ReceiptSerializer
-from .utils.gpt_utils import GPTQueryHandler
+from .models import Spending, Category, Receipt, ReceiptUpload, RecurringCharge, SpendingAnomaly
+from .serializers import SpendingSerializer, CategorySerializer, SpendingListSerializer, CategoryListSerializer, ReceiptSerializer, ReceiptUploadSerializer, RecurringChargeSerializer, SpendingAnomalySerializer
+from .utils.gpt_utils import get_gpt_handler
+from .db_router import replica_reads
+from .utils.export_utils import accepts_gzip, export_rows, csv_chunks, jsonl_chunks, gzip_chunks
+from .utils.upload_utils import ChunkError, OffsetConflict, append_chunk, discard, file_sha256, is_image, move_to_storage, part_path
 from rest_framework.parsers import MultiPartParser, FormParser
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -16,8 +22,16 @@ class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CategoryListSerializer
+        return CategorySerializer
+
     def get_queryset(self):
-        return Category.objects.filter(user=self.request.user)
+        queryset = Category.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            return queryset.values(*CategoryListSerializer.values)
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -29,8 +43,40 @@ class SpendingViewSet(viewsets.ModelViewSet):
     serializer_class = SpendingSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return SpendingListSerializer
+        return SpendingSerializer
+
+    def get_queryset(self):
+        queryset = Spending.objects.filter(user=self.request.user).order_by('-date')
+        if self.action == 'list':
+            return queryset.values(*SpendingListSerializer.values)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        with replica_reads(request):
+            return super().list(request, *args, **kwargs)
+
+class RecurringChargeViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for recurring charges found by detect_spending_patterns.
+    """
+    serializer_class = RecurringChargeSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return RecurringCharge.objects.filter(user=self.request.user).order_by('next_expected_date')
+
+class SpendingAnomalyViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for unusual spendings found by detect_spending_patterns.
+    """
+    serializer_class = SpendingAnomalySerializer
+    permission_classes = [IsAuthenticated]
+
     def get_queryset(self):
-        return Spending.objects.filter(user=self.request.user).order_by('-date')
+        return SpendingAnomaly.objects.filter(user=self.request.user).select_related('spending').order_by('-spending__date')
 
 def parse_date(date_str):
     """
@@ -51,7 +97,10 @@ def query_spendings(request):
     if not user_prompt:
         return Response({"error": "No prompt provided."}, status=400)
 
-    gpt_handler = GPTQueryHandler()
+    try:
+        gpt_handler = get_gpt_handler()
+    except ImportError:
+        return Response({"error": "Natural-language queries are not available on this server."}, status=503)
     gpt_response = gpt_handler.parse_query(user_prompt)  # structured JSON
 
     # If there's an error, return it
@@ -65,7 +114,8 @@ def query_spendings(request):
     start_date = parse_date(gpt_response.get("start_date"))
     end_date = parse_date(gpt_response.get("end_date"))
 
-    spendings_qs = Spending.objects.filter(user=request.user)
+    # Drafts extracted from receipts are not counted until the user confirms them
+    spendings_qs = Spending.objects.filter(user=request.user, is_draft=False)
 
     try:
         # Filter by category
@@ -78,9 +128,17 @@ def query_spendings(request):
                 queries |= Q(category__name__iexact=cat)
             spendings_qs = spendings_qs.filter(queries)
 
-        # Filter by name substring
+        # Filter by name substring, or by meaning when the embedding index is on
         if name_substring:
-            spendings_qs = spendings_qs.filter(name__icontains=name_substring)
+            name_filter = Q(name__icontains=name_substring)
+            if settings.SPENDING_EMBEDDINGS:
+                # Imported here so workers without the index never load NumPy
+                from .utils.embedding_utils import search_spending_ids
+
+                similar_ids = search_spending_ids(request.user.pk, name_substring)
+                if similar_ids:
+                    name_filter |= Q(id__in=similar_ids)
+            spendings_qs = spendings_qs.filter(name_filter)
 
         # Filter by date range
         if start_date:
@@ -88,26 +146,67 @@ def query_spendings(request):
         if end_date:
             spendings_qs = spendings_qs.filter(date__lte=end_date)
 
-        # Perform action based on GPT response
-        if action == "sum_spending":
-            total = spendings_qs.aggregate(sum=Sum('amount'))["sum"] or 0
-            return Response({"result": f"You spent ${total}."})
-        elif action == "list_spending":
-            data = [
-                {
-                    "name": s.name,
-                    "amount": str(s.amount),
-                    "date": str(s.date),
-                    "category": s.category.name if s.category else "Uncategorized"
-                }
-                for s in spendings_qs
-            ]
-            return Response({"result": data})
-        else:
-            return Response({"error": "Unknown action."}, status=400)
+        # Perform action based on GPT response, reading from the replica if there is one
+        with replica_reads(request):
+            if action == "sum_spending":
+                total = spendings_qs.aggregate(sum=Sum('amount'))["sum"] or 0
+                return Response({"result": f"You spent ${total}."})
+            elif action == "list_spending":
+                data = [
+                    {
+                        "name": s.name,
+                        "amount": str(s.amount),
+                        "date": str(s.date),
+                        "category": s.category.name if s.category else "Uncategorized"
+                    }
+                    for s in spendings_qs
+                ]
+                return Response({"result": data})
+            else:
+                return Response({"error": "Unknown action."}, status=400)
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_spendings(request):
+    """
+    Streams the user's full spending history as CSV or JSON lines.
+    Query params: type (csv or jsonl), start_date, end_date, category (id, also
+    matches its subcategories). Compressed with gzip when the client accepts it.
+    """
+    export_type = request.query_params.get("type", "csv")
+    if export_type not in ("csv", "jsonl"):
+        return Response({"error": "type must be 'csv' or 'jsonl'."}, status=400)
+
+    spendings_qs = Spending.objects.filter(user=request.user, is_draft=False)
+    for param, lookup in (("start_date", "date__gte"), ("end_date", "date__lte")):
+        value = request.query_params.get(param)
+        if value:
+            parsed = parse_date(value)
+            if parsed is None:
+                return Response({"error": f"Invalid {param}, expected YYYY-MM-DD."}, status=400)
+            spendings_qs = spendings_qs.filter(**{lookup: parsed})
+    category_id = request.query_params.get("category")
+    if category_id:
+        if not category_id.isdigit():
+            return Response({"error": "category must be a category id."}, status=400)
+        spendings_qs = spendings_qs.filter(Q(category_id=category_id) | Q(category__parent_id=category_id))
+
+    rows = export_rows(spendings_qs)
+    if export_type == "csv":
+        chunks, content_type = csv_chunks(rows), "text/csv"
+    else:
+        chunks, content_type = jsonl_chunks(rows), "application/x-ndjson"
+
+    compress = accepts_gzip(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    response = StreamingHttpResponse(gzip_chunks(chunks) if compress else chunks, content_type=content_type)
+    if compress:
+        response["Content-Encoding"] = "gzip"
+    response["Vary"] = "Accept-Encoding"
+    response["Content-Disposition"] = f'attachment; filename="spendings.{export_type}"'
+    return response
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def upload_receipt(request):
@@ -131,4 +230,85 @@ def upload_receipt(request):
     if serializer.is_valid():
         serializer.save(user=request.user)
         return Response(serializer.data, status=201)
-    return Response(serializer.errors, status=400)
\ No newline at end of file
+    return Response(serializer.errors, status=400)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_receipt_upload(request):
+    """
+    Starts a chunked, resumable receipt upload. Expects filename, size and the
+    sha256 of the whole file; chunks then go to the returned upload id.
+    """
+    serializer = ReceiptUploadSerializer(data=request.data)
+    if serializer.is_valid():
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=201)
+    return Response(serializer.errors, status=400)
+
+def get_upload(request, upload_id, lock=False):
+    """
+    Helper function to fetch one of the user's uploads, optionally row-locked.
+    """
+    uploads = ReceiptUpload.objects.filter(user=request.user, id=upload_id)
+    if lock:
+        uploads = uploads.select_for_update()
+    return uploads.first()
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def receipt_upload_chunk(request, upload_id):
+    """
+    GET returns the offset to resume from. PUT appends the raw request body at
+    the offset given in the Upload-Offset header; an optional X-Chunk-SHA256
+    header must match the chunk's checksum.
+    """
+    # No transaction: a slow chunk must not hold a connection and row lock open
+    upload = get_upload(request, upload_id)
+    if upload is None:
+        return Response({"error": "Upload not found."}, status=404)
+    if upload.is_expired():
+        discard(upload)
+        return Response({"error": "Upload expired, please start again."}, status=410)
+
+    if request.method == 'PUT':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({"error": "Upload-Offset header is required."}, status=400)
+        if offset != upload.offset:
+            return Response({"error": "Offset mismatch.", "offset": upload.offset}, status=409)
+        try:
+            append_chunk(upload, request.stream, offset, request.headers.get('X-Chunk-SHA256'))
+        except ReceiptUpload.DoesNotExist:
+            return Response({"error": "Upload not found."}, status=404)
+        except OffsetConflict as e:
+            return Response({"error": str(e), "offset": upload.offset}, status=409)
+        except ChunkError as e:
+            return Response({"error": str(e), "offset": upload.offset}, status=400)
+
+    return Response({"id": upload.id, "offset": upload.offset, "size": upload.size})
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_receipt_upload(request, upload_id):
+    """
+    Checks the whole file against its announced size and hash, then moves it
+    into media storage and creates the Receipt.
+    """
+    with transaction.atomic():
+        upload = get_upload(request, upload_id, lock=True)
+        if upload is None:
+            return Response({"error": "Upload not found."}, status=404)
+        if upload.offset != upload.size:
+            return Response({"error": "Upload incomplete.", "offset": upload.offset}, status=409)
+        if file_sha256(part_path(upload)) != upload.sha256:
+            discard(upload)
+            return Response({"error": "File checksum mismatch, upload discarded."}, status=400)
+        if not is_image(part_path(upload)):
+            discard(upload)
+            return Response({"error": "The uploaded file is not an image."}, status=400)
+
+        receipt = Receipt.objects.create(user=request.user, image=move_to_storage(upload))
+        upload.delete()
+
+    return Response(ReceiptSerializer(receipt, context={'request': request}).data, status=201)